@@ -0,0 +1,325 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils import PyCharmConstants, LOG_BACKEND
+from disasters import DisasterDataConverter
+from population import PopulationDataConverter
+from evaluation import Evaluation
+
+
+# Festlegen der Konstanten
+C = PyCharmConstants
+
+# Kommandozeilenprogramme, die ohne Abbildungen matplotlib nicht laden dürfen
+IMPORT_MODULES = ["disasters", "population", "evaluation", "pipeline", "server"]
+
+# Größe der echten Eingangsdaten
+EMDAT_EVENTS = 15407
+EMDAT_COUNTRIES = 227
+WPP_LOCATIONS = 475
+WPP_YEARS = range(1950, 2101)
+
+# Katastrophentypen mit Untergruppe, Untertypen und ungefährem Anteil an allen Ereignissen
+DISASTER_TYPES = [
+    ("Flood", "Hydrological", ["Riverine flood", "Flash flood", "Coastal flood", ""], 0.32),
+    ("Storm", "Meteorological", ["Tropical cyclone", "Convective storm", "Extra-tropical storm", ""], 0.26),
+    ("Earthquake", "Geophysical", ["Ground movement", "Tsunami"], 0.08),
+    ("Epidemic", "Biological", ["Bacterial disease", "Viral disease", "Parasitic disease", ""], 0.09),
+    ("Landslide", "Hydrological", ["Landslide", "Avalanche", "Mudslide"], 0.05),
+    ("Drought", "Climatological", ["Drought"], 0.05),
+    ("Extreme temperature", "Meteorological", ["Heat wave", "Cold wave", "Severe winter conditions"], 0.04),
+    ("Wildfire", "Climatological", ["Forest fire", "Land fire (Brush, Bush, Pasture)"], 0.03),
+    ("Volcanic activity", "Geophysical", ["Ash fall", "Lava flow", ""], 0.02),
+    ("Insect infestation", "Biological", ["Locust", "Grasshopper", ""], 0.01),
+    ("Mass movement (dry)", "Geophysical", ["Rockfall", "Landslide"], 0.01),
+    ("Fog", "Meteorological", [""], 0.001),
+    ("Impact", "Extra-terrestrial", ["Airburst"], 0.001),
+    ("Animal accident", "Biological", [""], 0.001)
+]
+CONTINENTS = ["Africa", "Americas", "Asia", "Europe", "Oceania"]
+ENTRY_CRITERIA = ["Kill", "Affect", "Declar", "Govern", ""]
+
+
+# Erzeugen synthetischer Eingangsdaten
+def location_name(ind):
+    return f"Land {ind:06d}"
+
+
+def iso_code(ind):
+    return "".join(chr(ord('A') + (ind // 26 ** power) % 26) for power in (2, 1, 0))
+
+
+def generate_emdat_csv(path, scale=1, seed=0):
+    """
+    Writes a semicolon-delimited CSV in the shape of the EM-DAT export (43 columns, deaths in column 34)
+    :param path: Target file
+    :param scale: Multiple of the size of the real export
+    :param seed: Seed of the random generator
+    :return: Number of written events
+    """
+    rng = random.Random(seed)
+    events = int(EMDAT_EVENTS * scale)
+    weights = [d_type[3] for d_type in DISASTER_TYPES]
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, delimiter=';')
+
+        for ind in range(events):
+            # Jüngere Jahre enthalten deutlich mehr Ereignisse als frühere
+            year = 2020 - int(100 * rng.random() ** 2.5)
+            country = rng.randrange(EMDAT_COUNTRIES)
+            d_type, d_subgroup, d_subtypes, _ = rng.choices(DISASTER_TYPES, weights)[0]
+
+            row = [''] * 43
+            row[0] = f"{year}-{ind:07d}-{iso_code(country)}"
+            row[1] = str(year)
+            row[3] = "Natural"
+            row[4] = d_subgroup
+            row[5] = d_type
+            row[6] = rng.choice(d_subtypes)
+            row[9] = rng.choice(ENTRY_CRITERIA)
+            row[10] = location_name(country)
+            row[11] = iso_code(country)
+            row[13] = CONTINENTS[country % len(CONTINENTS)]
+            row[34] = '' if rng.random() < 0.3 else str(int(rng.paretovariate(0.9)))
+            writer.writerow(row)
+
+    return events
+
+
+def generate_wpp_csv(path, scale=1, seed=0):
+    """
+    Writes a comma-delimited CSV in the shape of the UN WPP export, population in thousands with up to
+    three decimals in column 8 and the density in column 9
+    :param path: Target file
+    :param scale: Multiple of the size of the real export
+    :param seed: Seed of the random generator
+    :return: Number of written rows
+    """
+    rng = random.Random(seed)
+    locations = max(EMDAT_COUNTRIES, int(WPP_LOCATIONS * scale))
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+
+        for ind in range(locations):
+            population = rng.uniform(50, 500000)
+            growth = rng.uniform(1.0, 1.035)
+            area = rng.uniform(100, 10000000)
+
+            for year in WPP_YEARS:
+                total = f"{population:.3f}".rstrip('0').rstrip('.')
+                density = f"{population * 1000 / area:.3f}"
+                writer.writerow([ind, location_name(ind), 2, "Medium", year, year + 0.5, '', '', total, density])
+                population *= growth
+
+    return locations * len(WPP_YEARS)
+
+
+# Messen der einzelnen Schritte
+def measure(stage, function, items):
+    """
+    Runs one stage of the pipeline and measures it
+    :param stage: Name of the stage
+    :param function: Function without arguments
+    :param items: Number of processed events or rows
+    :return: Dict with wall time, peak RSS of the process so far, growth of that peak and items per second
+    """
+    # ru_maxrss ist der Höchststand des ganzen Prozesses, einem Schritt lässt sich nur dessen Anstieg zuordnen
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        function()
+        wall = time.perf_counter() - started
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return {
+        "stage": stage,
+        "wall_s": wall,
+        "process_peak_rss_mb": peak_after,
+        "peak_rss_growth_mb": peak_after - peak_before,
+        "items": items,
+        "items_per_s": items / wall if wall > 0 else float("inf")
+    }
+
+
+def run_scale(scale, seed=0):
+    """
+    Generates synthetic inputs of the given scale in a temporary directory and runs every stage on them
+    :param scale: Multiple of the size of the real exports
+    :param seed: Seed of the random generators
+    :return: List of the measurements of all stages
+    """
+    # Meldungen der Schritte würden die Messung verfälschen
+    LOG_BACKEND.configure(quiet=True)
+
+    # Die Konverter erwarten ihre Daten relativ zum Arbeitsverzeichnis in ./../resources
+    root = tempfile.mkdtemp(prefix="disasters-benchmark-")
+    os.makedirs(f"{root}/code")
+    os.makedirs(f"{root}/resources")
+    working_dir = os.getcwd()
+    os.chdir(f"{root}/code")
+
+    try:
+        results = run_stages(scale, seed)
+    finally:
+        os.chdir(working_dir)
+        shutil.rmtree(root, ignore_errors=True)
+
+    for result in results:
+        result["scale"] = scale
+
+    return results
+
+
+def run_stages(scale, seed):
+    events = generate_emdat_csv(C.EMDAT_DISASTERS_DATA_PATH.value, scale, seed)
+    rows = generate_wpp_csv(C.UN_POPULATION_DATA_PATH.value, scale, seed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        disasters = DisasterDataConverter()
+        population = PopulationDataConverter()
+        evaluation = Evaluation(batch=True)
+    countries = max(EMDAT_COUNTRIES, int(WPP_LOCATIONS * scale))
+
+    return [
+        measure("disasters.convert_data_from_file", disasters.convert_data_from_file, events),
+        measure("disasters.extract_disasters", disasters.extract_disasters, events),
+        measure("disasters.write_data", disasters.write_data, events),
+        measure("population.get_data_from_file", population.get_data_from_file, rows),
+        measure("population.convert_data", population.convert_data, rows),
+        measure("population.extract_countries", population.extract_countries, countries),
+        measure("population.calculate_missing_population_numbers",
+                population.calculate_missing_population_numbers, countries),
+        measure("population.sort_data", population.sort_data, countries),
+        measure("population.calculate_development", population.calculate_development, countries),
+        measure("population.write_data", population.write_data, countries),
+        measure("evaluation.load_stores", evaluation.load_stores, events),
+        measure("evaluation.generate_adpy_values", evaluation.generate_adpy_values, events),
+        measure("evaluation.generate_summit", evaluation.generate_summit, events),
+        measure("evaluation.generate_and_save_output", evaluation.generate_and_save_output, events)
+    ]
+
+
+def measure_import(module, repeats=5):
+    """
+    Imports a module in fresh interpreters and keeps the fastest run
+    :param module: Name of the module
+    :param repeats: Number of interpreters
+    :return: Dict with the import time, the peak RSS and whether matplotlib was loaded
+    """
+    code = (
+        "import resource, sys, time; started = time.perf_counter(); import {module}; "
+        "print(time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "
+        "'matplotlib' in sys.modules)"
+    ).format(module=module)
+
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        wall, peak, matplotlib_loaded = output.stdout.split()[-3:]
+        runs.append((float(wall), int(peak) / 1024, matplotlib_loaded == "True"))
+
+    wall, peak, matplotlib_loaded = min(runs)
+    return {
+        "stage": f"import {module}",
+        "wall_s": wall,
+        "peak_rss_mb": peak,
+        "items": 1,
+        "items_per_s": 1 / wall if wall > 0 else float("inf"),
+        "scale": 0,
+        "matplotlib": matplotlib_loaded
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    :param results: Measurements of the current run
+    :param baseline: Measurements of an earlier run
+    :param tolerance: Allowed relative increase of the wall time, e.g. 0.5 for 50 %
+    :return: List of messages for every stage that got slower than allowed
+    """
+    previous = {(result["scale"], result["stage"]): result for result in baseline}
+    regressions = []
+
+    for result in results:
+        if result.get("matplotlib"):
+            regressions.append(f"{result['stage']} lädt matplotlib")
+
+        key = (result["scale"], result["stage"])
+        if key in previous and result["wall_s"] > previous[key]["wall_s"] * (1 + tolerance):
+            regressions.append(
+                f"{result['stage']} (x{result['scale']}): {previous[key]['wall_s']:.3f} s -> {result['wall_s']:.3f} s"
+            )
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Laufzeitmessung der Pipeline mit synthetischen Daten")
+    parser.add_argument("--scales", type=float, nargs="*", default=[1, 10, 100], help="Vielfache der echten Datenmenge")
+    parser.add_argument("--imports", action="store_true", help="Zusätzlich die Importzeiten der Programme messen")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert der Zufallsdaten")
+    parser.add_argument("--output", help="Sichern der Messwerte als JSON-Datei")
+    parser.add_argument("--compare", help="JSON-Datei eines früheren Laufs zum Erkennen von Verschlechterungen")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Erlaubte relative Verlangsamung je Schritt")
+    arguments = parser.parse_args()
+
+    measurements = []
+    if arguments.imports:
+        import_results = [measure_import(module) for module in IMPORT_MODULES]
+
+        print("Imports")
+        print(f"{'Module':<52}{'Wall [s]':>10}{'Peak RSS [MB]':>15}{'matplotlib':>14}")
+        for measurement in import_results:
+            print(f"{measurement['stage']:<52}{measurement['wall_s']:>10.3f}"
+                  f"{measurement['peak_rss_mb']:>15.1f}{str(measurement['matplotlib']):>14}")
+        print()
+
+        measurements.extend(import_results)
+
+    for benchmark_scale in arguments.scales:
+        # Jede Größe läuft in einem eigenen Prozess, damit der Spitzenverbrauch nicht verfälscht wird
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            scale_results = executor.submit(run_scale, benchmark_scale, arguments.seed).result()
+
+        print(f"Scale x{benchmark_scale:g}")
+        print(f"{'Stage':<52}{'Wall [s]':>10}{'Process peak [MB]':>19}{'Peak growth [MB]':>18}{'Items/s':>14}")
+        for measurement in scale_results:
+            print(f"{measurement['stage']:<52}{measurement['wall_s']:>10.3f}"
+                  f"{measurement['process_peak_rss_mb']:>19.1f}{measurement['peak_rss_growth_mb']:>18.1f}"
+                  f"{measurement['items_per_s']:>14.0f}")
+        print()
+
+        measurements.extend(scale_results)
+
+    if arguments.output:
+        with open(arguments.output, 'w+') as file:
+            json.dump(measurements, file, indent=2)
+
+    # Ohne früheren Lauf wird nur das Laden von matplotlib geprüft
+    previous_measurements = []
+    if arguments.compare:
+        with open(arguments.compare, 'r') as file:
+            previous_measurements = json.load(file)
+
+    found = find_regressions(measurements, previous_measurements, arguments.tolerance)
+    for message in found:
+        print(f"Regression: {message}")
+
+    sys.exit(1 if found else 0)
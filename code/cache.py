@@ -0,0 +1,130 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+from utils import LogProgress
+
+
+def file_digest(path):
+    """
+    :param path: File to hash
+    :return: SHA-256 hex digest of the content of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def code_version(*objects):
+    """
+    :param objects: Modules, classes or functions whose source code determines the output of a stage
+    :return: SHA-256 hex digest of their source code
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class StageCache(object):
+    """
+    Content-addressed cache of the outputs of pipeline stages.
+    The key of an output is a hash of the stage name, its input files or upstream keys, the version of its code
+    and its parameters. Outputs are stored as pickle files named by their key; when the folder grows beyond
+    its size limit, the least recently used outputs are removed.
+
+    It takes the cache folder and its size limit in bytes as arguments: StageCache(folder, max_bytes)
+    """
+    name = "StageCache"
+    log = None
+
+    @LogProgress()
+    def __init__(self, folder, max_bytes=1 << 30):
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+    def key(self, stage, files=(), upstream=(), code="", parameters=None):
+        """
+        :param stage: Name of the stage
+        :param files: Paths of the input files
+        :param upstream: Keys of the stages whose outputs are used
+        :param code: Code version of the stage, see code_version
+        :param parameters: JSON-serializable parameters of the stage
+        :return: Hex key of the output
+        """
+        description = {
+            "stage": stage,
+            "files": [file_digest(path) for path in files],
+            "upstream": list(upstream),
+            "code": code,
+            "parameters": parameters or {}
+        }
+
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.pickle")
+
+    def get(self, key):
+        """
+        :param key: Key of the output
+        :return: Stored output or None if the cache does not contain it
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                output = pickle.load(file)
+        except OSError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Beschädigte Dateien und Ergebnisse umbenannter oder verschobener Klassen werden entfernt
+            self.log(f"Zwischenergebnis {key[:12]} nicht lesbar und entfernt", log_type="ERROR")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # Die Änderungszeit dient als Zeitpunkt der letzten Verwendung
+        os.utime(path)
+        self.log(f"Zwischenergebnis {key[:12]} verwendet")
+
+        return output
+
+    def put(self, key, output):
+        """
+        Stores an output and removes the least recently used outputs beyond the size limit
+        :param key: Key of the output
+        :param output: Picklable output of the stage
+        :return: nothing
+        """
+        os.makedirs(self.folder, exist_ok=True)
+
+        descriptor, temporary = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        with os.fdopen(descriptor, 'wb') as file:
+            pickle.dump(output, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path(key))
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith(".pickle"):
+                stat = os.stat(os.path.join(self.folder, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            os.remove(os.path.join(self.folder, name))
+            total -= size
+            self.log(f"Zwischenergebnis {name[:12]} entfernt")
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import json
+import numpy as np
+from utils import PyCharmConstants, FIRST_YEAR
+from store import current_version
+from resolver import country_isos
+from engine import EventTable
+
+
+# Festlegen der Konstanten
+C = PyCharmConstants
+
+
+def load_disaster_file(d_type, folder=None):
+    """
+    :param d_type: Name of a disaster type
+    :param folder: Version of the disaster folder to read from, the currently published one if None
+    :return: Events of the type nested as {year: {ident: event}} from the JSON file of DisasterDataConverter
+    """
+    folder = current_version(C.DEVELOPMENT_OF_DISASTERS_FOLDER_PATH.value) if folder is None else folder
+    with open(f"{folder}/{str(d_type).lower()}.json", 'r') as file:
+        return json.load(file)
+
+
+class DisasterDataset(object):
+    """
+    Lazy access to the disaster events of the evaluation.
+    The events of a disaster type are only loaded when they are first needed and the last used types are kept
+    in a cache. Subsets by type, year range and country are built from these per-type tables.
+    The events are taken from the data of a converter in the same process, the packed store or the JSON files.
+
+    It takes the population index, the type register, a function resolving (country, iso) pairs and the
+    sources as arguments:
+    DisasterDataset(population_index, disaster_types, resolve_countries, store=None, disaster_data=None, cache_size=16)
+    """
+
+    def __init__(self, population_index, disaster_types, resolve_countries, store=None, disaster_data=None,
+                 cache_size=16):
+        self.population_index = population_index
+        self.disaster_types = list(disaster_types)
+        self.resolve_countries = resolve_countries
+        self.store = store
+        self.disaster_data = disaster_data
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.folder = None  # Version des Ordners, aus der alle Typen gelesen werden
+
+    def type_table(self, d_type):
+        """
+        :param d_type: Name of a disaster type of the register
+        :return: EventTable with the events of this type
+        """
+        if d_type not in self.disaster_types:
+            raise KeyError(f"Unknown disaster type {d_type}")
+
+        if d_type in self.cache:
+            self.cache.move_to_end(d_type)
+            return self.cache[d_type]
+
+        table = self.load(d_type)
+
+        self.cache[d_type] = table
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return table
+
+    def load(self, d_type):
+        if self.disaster_data is None and self.store is not None:
+            self.resolve_countries(self.store.country_isos())
+            return self.store.to_event_table(self.population_index, [d_type])
+
+        if self.disaster_data is not None:
+            disasters = {d_type: self.disaster_data[d_type]}
+        else:
+            if self.folder is None:
+                self.folder = current_version(C.DEVELOPMENT_OF_DISASTERS_FOLDER_PATH.value)
+            disasters = {d_type: load_disaster_file(d_type, self.folder)}
+
+        self.resolve_countries(country_isos(disasters))
+        return EventTable.from_disasters(disasters, self.population_index)
+
+    def table(self, types=None, years=None, countries=None):
+        """
+        :param types: Names of the disaster types, all types of the register if None
+        :param years: Tuple of the first and the last year, all years if None
+        :param countries: EM-DAT country names or ISO codes, all countries if None
+        :return: EventTable with the selected events, the disaster types in the given order
+        """
+        types = self.disaster_types if types is None else list(types)
+        table = EventTable.concatenate([self.type_table(d_type) for d_type in types], types)
+        mask = np.ones(len(table), dtype=bool)
+
+        if years is not None:
+            first, last = years
+            mask &= (table.years >= first - FIRST_YEAR) & (table.years <= last - FIRST_YEAR)
+
+        if countries is not None and len(table) > 0:
+            mask &= table.isin("country", countries) | table.isin("iso", countries)
+
+        return table if np.all(mask) else table.select(mask)
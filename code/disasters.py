@@ -1,10 +1,52 @@
-import json
+import os
+import sys
 from utils import LogProgress, Secure, PyCharmConstants, CSVReader, check_dir
+from store import disaster_store_writers, json_writers, publish_files
 
 
 # Festlegen der Konstanten
 C = PyCharmConstants
 
+# Von der Auswertung genutzte Spalten der EM-DAT-Datei in der Reihenfolge von add_event
+EMDAT_COLUMNS = (0, 1, 3, 4, 5, 6, 9, 10, 11, 13, 34)
+
+
+class DisasterEvent(object):
+    """
+    Compact record of one disaster event with the fields of the former event dicts.
+    The fields can be read like the keys of a dict, e.g. event["country"].
+
+    It takes the values of all fields as arguments:
+    DisasterEvent(continent, country, iso, group, subgroup, d_type, subtype, deaths, entry)
+    """
+    __slots__ = ("continent", "country", "iso", "group", "subgroup", "type", "subtype", "deaths", "entry")
+
+    def __init__(self, continent, country, iso, group, subgroup, d_type, subtype, deaths, entry):
+        self.continent = continent
+        self.country = country
+        self.iso = iso
+        self.group = group
+        self.subgroup = subgroup
+        self.type = d_type
+        self.subtype = subtype
+        self.deaths = deaths
+        self.entry = entry
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def as_dict(self):
+        """
+        :return: Event as dict in the format of the JSON files
+        """
+        return {key: getattr(self, key) for key in self.__slots__}
+
 
 class DisasterDataConverter(CSVReader):
     name = "DisasterDataConverter"
@@ -15,34 +57,47 @@ class DisasterDataConverter(CSVReader):
         super().__init__(C.EMDAT_DISASTERS_DATA_PATH.value, ';')
         self.disasters = []
         self.countries = []
+        self.known_countries = set()
+        self.event_count = 0
 
     # Auswerten der aus der Datei bezogenen Daten
     @Secure("data")
     @LogProgress()
     def convert_data(self):
         for row in self.data:
-            ident = str(row[0])
-            continent = str(row[13])
-            country = str(row[10])
-            iso = str(row[11])
-            year = str(row[1])
-            d_group = str(row[3])
-            d_subgroup = str(row[4])
-            d_type = str(row[5])
-            d_subtype = str(row[6])
-            deaths = int(str(row[34])) if str(row[34]) != '' else 0
-            entry_criteria = str(row[9])
-
-            if country not in self.countries:
-                self.countries.append(country)
-
-            if d_type in self.converted_data:
-                if year in self.converted_data[d_type]:
-                    self.converted_data[d_type][year][ident] = {"continent": continent, "country": country, "iso": iso, "group": d_group, "subgroup": d_subgroup, "type": d_type, "subtype": d_subtype, "deaths": deaths, "entry": entry_criteria}
-                else:
-                    self.converted_data[d_type][year] = {ident: {"continent": continent, "country": country, "iso": iso, "group": d_group, "subgroup": d_subgroup, "type": d_type, "subtype": d_subtype, "deaths": deaths, "entry": entry_criteria}}
-            else:
-                self.converted_data[d_type] = {year: {ident: {"continent": continent, "country": country, "iso": iso, "group": d_group, "subgroup": d_subgroup, "type": d_type, "subtype": d_subtype, "deaths": deaths, "entry": entry_criteria}}}
+            self.add_event(*[row[column] for column in EMDAT_COLUMNS])
+
+    # Auswerten der Daten direkt beim Auslesen der Datei, ohne sie vollständig zu speichern
+    @Secure("file")
+    @LogProgress("event_count")
+    def convert_data_from_file(self):
+        for row in self.stream_data_from_file(EMDAT_COLUMNS):
+            self.add_event(*row)
+
+        self.log("Alle Daten aus der Datei ausgelesen")
+
+    # Einordnen eines einzelnen Ereignisses
+    def add_event(self, ident, year, d_group, d_subgroup, d_type, d_subtype, entry_criteria, country, iso, continent,
+                  deaths):
+        # Wiederkehrende Werte werden nur einmal im Speicher gehalten
+        continent = sys.intern(str(continent))
+        country = sys.intern(str(country))
+        iso = sys.intern(str(iso))
+        year = sys.intern(str(year))
+        d_group = sys.intern(str(d_group))
+        d_subgroup = sys.intern(str(d_subgroup))
+        d_type = sys.intern(str(d_type))
+        d_subtype = sys.intern(str(d_subtype))
+        deaths = int(str(deaths)) if str(deaths) != '' else 0
+        entry_criteria = sys.intern(str(entry_criteria))
+        self.event_count += 1
+
+        if country not in self.known_countries:
+            self.known_countries.add(country)
+            self.countries.append(country)
+
+        event = DisasterEvent(continent, country, iso, d_group, d_subgroup, d_type, d_subtype, deaths, entry_criteria)
+        self.converted_data.setdefault(d_type, {}).setdefault(year, {})[str(ident)] = event
 
     # Extrahieren der Katastrophentypen
     @Secure("converted_data")
@@ -51,32 +106,29 @@ class DisasterDataConverter(CSVReader):
         for d_type in self.converted_data:
             self.disasters.append(d_type)
 
-    # Sichern der Daten in JSON-Dateien
+    # Sichern der Daten in JSON-Dateien und als gepackte Spalten für die Auswertung, als eine Version des Ordners
     @Secure("converted_data")
-    @LogProgress()
+    @LogProgress("event_count")
     def write_data(self):
         if not check_dir(C.DEVELOPMENT_OF_DISASTERS_FOLDER_PATH.value):
             return
 
-        with open(f"{C.DEVELOPMENT_OF_DISASTERS_FOLDER_PATH.value}/all_disasters.json", 'w+') as file:
-            json.dump(self.converted_data, file)
-
-        with open(C.DISASTER_COUNTRIES_REGISTER_PATH.value, 'w+') as file:
-            json.dump(self.countries, file)
-
-        with open(C.DISASTER_TYPE_REGISTER_PATH.value, 'w+') as file:
-            json.dump(self.disasters, file)
-
+        files = {
+            "all_disasters.json": self.converted_data,
+            os.path.basename(C.DISASTER_COUNTRIES_REGISTER_PATH.value): self.countries,
+            os.path.basename(C.DISASTER_TYPE_REGISTER_PATH.value): self.disasters
+        }
         for d_type in self.converted_data:
-            loc = str(d_type).replace('/', '_').lower()
-            with open(f"{C.DEVELOPMENT_OF_DISASTERS_FOLDER_PATH.value}/{loc}.json", 'w+') as file:
-                json.dump(self.converted_data[d_type], file)
+            files[f"{str(d_type).replace('/', '_').lower()}.json"] = self.converted_data[d_type]
+
+        writers = json_writers(files, default=DisasterEvent.as_dict)
+        writers.update(disaster_store_writers(C.DISASTER_STORE_PATH.value, self.converted_data))
+        publish_files(C.DEVELOPMENT_OF_DISASTERS_FOLDER_PATH.value, writers)
 
 
 # Prozess und Ablauf der Analyse
 if __name__ == '__main__':
     converter = DisasterDataConverter()
-    converter.get_data_from_file()
-    converter.convert_data()
+    converter.convert_data_from_file()
     converter.extract_disasters()
     converter.write_data()
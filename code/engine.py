@@ -0,0 +1,267 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils import FIRST_YEAR, YEAR_COUNT, LOG_BACKEND
+
+
+# Bevölkerungszahlen innerhalb der Prozesse von aggregate_parallel
+worker_population_counts = None
+
+# Kategorische Felder der Ereignisse neben dem Typ
+CATEGORICAL_FIELDS = ("country", "continent", "iso", "group", "subgroup", "subtype", "entry")
+
+
+class EventTable(object):
+    """
+    Columnar table of disaster events.
+    Every event is one entry in the NumPy columns types (index into type_names), years (index from 1920),
+    deaths and rows (row of the population index). The optional categories hold the other fields of the
+    events dictionary-encoded as {field: (names, codes)}.
+
+    It takes the columns and the names of the disaster types as arguments:
+    EventTable(type_names, types, years, deaths, rows, categories=None)
+    """
+
+    def __init__(self, type_names, types, years, deaths, rows, categories=None):
+        self.type_names = list(type_names)
+        self.types = np.asarray(types, dtype=np.int64)
+        self.years = np.asarray(years, dtype=np.int64)
+        self.deaths = np.asarray(deaths, dtype=np.float64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.categories = {
+            field: (list(names), np.asarray(codes, dtype=np.int64))
+            for field, (names, codes) in (categories or {}).items()
+        }
+
+    def __len__(self):
+        return len(self.types)
+
+    def select(self, mask):
+        """
+        :param mask: Boolean array or index array over the events
+        :return: New EventTable with the selected events and the same types
+        """
+        return EventTable(
+            self.type_names, self.types[mask], self.years[mask], self.deaths[mask], self.rows[mask],
+            {field: (names, codes[mask]) for field, (names, codes) in self.categories.items()}
+        )
+
+    def field(self, name):
+        """
+        :param name: "type" or one of the categorical fields, e.g. "continent"
+        :return: Tuple of (names, codes) of the field
+        """
+        if name == "type":
+            return self.type_names, self.types
+
+        if name not in self.categories:
+            raise KeyError(f"Unknown field {name}")
+
+        return self.categories[name]
+
+    def isin(self, field, values):
+        """
+        :param field: "type" or one of the categorical fields, e.g. "continent"
+        :param values: Names of the wanted values of the field
+        :return: Boolean array, True for every event whose field has one of the values
+        """
+        names, codes = self.field(field)
+        values = set(values)
+
+        return np.isin(codes, [code for code, name in enumerate(names) if name in values])
+
+    @classmethod
+    def from_disasters(cls, disasters, population_index):
+        """
+        Builds the table from disaster data nested as {type: {year: {ident: event}}}
+        :param disasters: Dict of disaster types in the order of the type register
+        :param population_index: PopulationIndex used to resolve the country of each event
+        :return: EventTable with all events between 1920 and 2020
+        """
+        types, years, deaths, rows = [], [], [], []
+        names = {field: {} for field in CATEGORICAL_FIELDS}
+        codes = {field: [] for field in CATEGORICAL_FIELDS}
+
+        for type_ind, d_type in enumerate(disasters):
+            for year, events in disasters[d_type].items():
+                year_ind = int(year) - FIRST_YEAR
+                if not 0 <= year_ind < YEAR_COUNT:
+                    continue
+
+                for event in events.values():
+                    row = population_index.resolve(str(event["country"]))
+                    if row is None:
+                        raise KeyError(f"No population data for {event['country']}")
+
+                    types.append(type_ind)
+                    years.append(year_ind)
+                    deaths.append(float(event["deaths"]))
+                    rows.append(row)
+                    for field in CATEGORICAL_FIELDS:
+                        codes[field].append(names[field].setdefault(str(event[field]), len(names[field])))
+
+        categories = {field: (list(names[field]), codes[field]) for field in CATEGORICAL_FIELDS}
+        return cls(disasters.keys(), types, years, deaths, rows, categories)
+
+    @classmethod
+    def concatenate(cls, tables, type_names):
+        """
+        Joins several tables, e.g. the tables of single disaster types, into one table
+        :param tables: List of EventTables, their type names have to be contained in type_names
+        :param type_names: Names of the disaster types of the joined table
+        :return: EventTable with the events of all tables in the order of the tables
+        """
+        type_names = list(type_names)
+        fields = [field for field in CATEGORICAL_FIELDS if all(field in table.categories for table in tables)]
+        names = {field: {} for field in fields}
+        types, codes = [], {field: [] for field in fields}
+
+        for table in tables:
+            type_map = np.array([type_names.index(d_type) for d_type in table.type_names], dtype=np.int64)
+            types.append(type_map[table.types])
+
+            # Umkodieren der Kategorien auf die gemeinsamen Namen
+            for field in fields:
+                field_names, field_codes = table.categories[field]
+                code_map = np.array(
+                    [names[field].setdefault(name, len(names[field])) for name in field_names], dtype=np.int64
+                )
+                codes[field].append(code_map[field_codes])
+
+        if not tables:
+            return cls(type_names, [], [], [], [])
+
+        categories = {field: (list(names[field]), np.concatenate(codes[field])) for field in fields}
+        return cls(
+            type_names, np.concatenate(types), np.concatenate([table.years for table in tables]),
+            np.concatenate([table.deaths for table in tables]), np.concatenate([table.rows for table in tables]),
+            categories
+        )
+
+
+def aggregate(table, population_counts):
+    """
+    Computes ADPY values, deaths and number of events for every type and year (Formel 2)
+    :param table: EventTable
+    :param population_counts: (country x year) matrix of population counts
+    :return: Tuple of (adpys, numbers, deaths), each shaped (types x years)
+    """
+    return aggregate_groups(table, population_counts, table.types, len(table.type_names))
+
+
+def aggregate_groups(table, population_counts, groups, group_count):
+    """
+    Computes ADPY values, deaths and number of events for every group of events and year (Formel 2)
+    :param table: EventTable
+    :param population_counts: (country x year) matrix of population counts
+    :param groups: Group index of every event
+    :param group_count: Number of groups
+    :return: Tuple of (adpys, numbers, deaths), each shaped (groups x years)
+    """
+    size = group_count * YEAR_COUNT
+    cells = groups * YEAR_COUNT + table.years
+
+    numbers = np.bincount(cells, minlength=size).astype(np.float64)
+    deaths = np.bincount(cells, weights=table.deaths, minlength=size)
+
+    # Anteil der Todesfälle an der Bevölkerung, geteilt durch die Anzahl der Ereignisse im Jahr
+    adpn = table.deaths / population_counts[table.rows, table.years] / numbers[cells]
+    adpys = np.bincount(cells, weights=adpn, minlength=size)
+
+    shape = (group_count, YEAR_COUNT)
+    return adpys.reshape(shape), numbers.reshape(shape), deaths.reshape(shape)
+
+
+def init_worker(population_counts):
+    """
+    Provides the population counts and the log output to a worker process of aggregate_parallel.
+    A memory-mapped matrix is opened again by its path, so all processes share one copy in the page cache.
+    :param population_counts: Path of the .npy file or the matrix itself
+    :return: nothing
+    """
+    global worker_population_counts
+
+    LOG_BACKEND.configure_worker()
+    if isinstance(population_counts, str):
+        worker_population_counts = np.load(population_counts, mmap_mode='r')
+    else:
+        worker_population_counts = population_counts
+
+
+def aggregate_partition(partition):
+    """
+    Task of a worker process of aggregate_parallel, uses the population counts provided by init_worker
+    :param partition: Arguments of the EventTable of one disaster type
+    :return: Tuple of (adpys, numbers, deaths), each shaped (1 x years)
+    """
+    return aggregate(EventTable(*partition), worker_population_counts)
+
+
+def aggregate_parallel(table, population_counts, workers=None):
+    """
+    Computes the same values as aggregate, every disaster type is computed in a process pool
+    :param table: EventTable
+    :param population_counts: (country x year) matrix of population counts, memory-mapped matrices are shared
+    :param workers: Number of processes, all cores if None
+    :return: Tuple of (adpys, numbers, deaths), each shaped (types x years), rows in the order of table.type_names
+    """
+    partitions = []
+    for ind, d_type in enumerate(table.type_names):
+        mask = table.types == ind
+        partitions.append(([d_type], np.zeros(np.sum(mask)), table.years[mask], table.deaths[mask], table.rows[mask]))
+
+    source = population_counts.filename if isinstance(population_counts, np.memmap) else population_counts
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(source,)) as executor:
+        results = list(executor.map(aggregate_partition, partitions))
+
+    # Zusammenführen der Ergebnisse in der Reihenfolge der Typen
+    shape = (len(table.type_names), YEAR_COUNT)
+    adpys, numbers, deaths = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    for ind, (type_adpys, type_numbers, type_deaths) in enumerate(results):
+        adpys[ind], numbers[ind], deaths[ind] = type_adpys[0], type_numbers[0], type_deaths[0]
+
+    return adpys, numbers, deaths
+
+
+def mix(values):
+    """
+    Mixes 64 bit values with the finalizer of SplitMix64, every input bit changes about half of the output bits
+    :param values: Array of uint64
+    :return: Array of uint64
+    """
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def fingerprint(table, population_counts):
+    """
+    Computes a digest of the inputs of every (type, year) partition.
+    Every event is hashed from its deaths and the population number used for it, a partition sums the hashes of its
+    events in two independent 64 bit lanes. The digest changes whenever an event or the underlying population
+    changes and does not depend on the order of the events.
+    :param table: EventTable
+    :param population_counts: (country x year) matrix of population counts
+    :return: Array of 16 byte digests shaped (types x years), empty partitions have an empty digest
+    """
+    shape = (len(table.type_names), YEAR_COUNT)
+    size = shape[0] * shape[1]
+    lanes = np.zeros((size, 2), dtype=np.uint64)
+    if len(table) == 0:
+        return lanes.view("S16").reshape(shape)
+
+    cells = table.types * YEAR_COUNT + table.years
+    populations = np.ascontiguousarray(population_counts[table.rows, table.years], dtype=np.float64)
+
+    # Hashen der Bitmuster von Todesfällen und Bevölkerungszahl je Ereignis
+    first = mix(mix(np.ascontiguousarray(table.deaths).view(np.uint64)) ^ populations.view(np.uint64))
+    second = mix(first ^ np.uint64(0x5851F42D4C957F2D))
+
+    # Summieren je Partition mit bincount getrennt nach den 32 Bit Hälften, deren Summen float64 exakt darstellt,
+    # zusammengesetzt rechnet der Überlauf modulo 2^64
+    for lane, hashes in enumerate((first, second)):
+        low = np.bincount(cells, weights=hashes & np.uint64(0xFFFFFFFF), minlength=size)
+        high = np.bincount(cells, weights=hashes >> np.uint64(32), minlength=size)
+        lanes[:, lane] = low.astype(np.uint64) + (high.astype(np.uint64) << np.uint64(32))
+
+    return lanes.view("S16").reshape(shape)
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+import numpy as np
+from engine import aggregate_groups
+
+
+class GroupBy(object):
+    """
+    Group-by engine over an EventTable.
+    Computes ADPY values, deaths and number of events per year for every combination of the values of
+    any fields of the events, e.g. ("continent",) or ("type", "subgroup"), in one vectorized pass.
+    The results of the last queries are kept in a cache.
+
+    It takes the table, the population counts and the size of the cache as arguments:
+    GroupBy(table, population_counts, cache_size=64)
+    """
+
+    def __init__(self, table, population_counts, cache_size=64):
+        self.table = table
+        self.population_counts = population_counts
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def query(self, *fields):
+        """
+        :param fields: Fields to group by, "type" or one of the categorical fields of the table
+        :return: Tuple of (keys, adpys, numbers, deaths), keys is a list of tuples of the field values,
+                 the arrays are shaped (groups x years) in the order of the keys
+        """
+        if not fields:
+            raise ValueError("At least one field is needed to group by")
+
+        if fields in self.cache:
+            self.cache.move_to_end(fields)
+            return self.cache[fields]
+
+        result = self.compute(fields)
+
+        self.cache[fields] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return result
+
+    def compute(self, fields):
+        names, codes = zip(*[self.table.field(field) for field in fields])
+
+        # Zusammenfassen der Codes aller Felder zu einem Schlüssel je Ereignis und Vergeben fortlaufender Gruppen
+        keys = np.ravel_multi_index(codes, [len(field_names) for field_names in names])
+        unique_keys, groups = np.unique(keys, return_inverse=True)
+
+        adpys, numbers, deaths = aggregate_groups(self.table, self.population_counts, groups, len(unique_keys))
+
+        group_codes = np.unravel_index(unique_keys, [len(field_names) for field_names in names])
+        group_names = [
+            tuple(names[field][group_codes[field][group]] for field in range(len(fields)))
+            for group in range(len(unique_keys))
+        ]
+
+        return group_names, adpys, numbers, deaths
@@ -0,0 +1,95 @@
+import json
+import os
+import numpy as np
+from utils import LogProgress, PyCharmConstants, FIRST_YEAR, YEAR_COUNT, country_file_name
+from store import open_population_matrix, current_version
+from resolver import CountryResolver
+
+
+# Festlegen der Konstanten
+C = PyCharmConstants
+
+
+class PopulationIndex(object):
+    """
+    In-memory index of the population development of every country.
+    Loads each country file of the population folder once and keeps the counts in a dense
+    (country x year) array. Disaster country names are resolved once by a CountryResolver.
+
+    It takes the country register of the population data as argument: PopulationIndex(population_countries)
+    """
+    name = "PopulationIndex"
+    log = None
+
+    @LogProgress()
+    def __init__(self, population_countries):
+        self.population_countries = list(population_countries)
+        self.rows = {country: row for row, country in enumerate(self.population_countries)}
+        self.resolver = CountryResolver(self.population_countries)
+        self.counts = np.zeros((len(self.population_countries), YEAR_COUNT))
+
+    @classmethod
+    def from_matrix(cls, counts_path, index_path):
+        """
+        Creates the index on top of the memory-mapped matrix written by PopulationDataConverter.write_data.
+        The counts are not copied, lookups read directly from the mapped file.
+        :param counts_path: Path of the .npy file with the population counts
+        :param index_path: Path of the JSON file with the row names
+        :return: Loaded PopulationIndex
+        """
+        # Matrix und Index werden aus derselben veröffentlichten Version gelesen
+        folder = current_version(os.path.dirname(counts_path) or ".")
+        counts_path = os.path.join(folder, os.path.basename(counts_path))
+        index_path = os.path.join(folder, os.path.basename(index_path))
+
+        with open(index_path, 'r') as file:
+            index = cls(json.load(file))
+
+        index.counts = open_population_matrix(counts_path)
+        if index.counts.shape != (len(index.population_countries), YEAR_COUNT):
+            raise ValueError(f"Population matrix {counts_path} does not match its index {index_path}")
+
+        return index
+
+    @classmethod
+    def from_converted_data(cls, converted_data):
+        """
+        Creates the index directly from the data of a PopulationDataConverter in the same process
+        :param converted_data: converted_data of PopulationDataConverter, nested as {country: {year: {"count"}}}
+        :return: Loaded PopulationIndex
+        """
+        index = cls(converted_data.keys())
+
+        for row, country in enumerate(index.population_countries):
+            for year in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT):
+                index.counts[row, year - FIRST_YEAR] = float(converted_data[country][str(year)]["count"])
+
+        return index
+
+    # Laden aller Bevölkerungsentwicklungen in die Matrix
+    @LogProgress()
+    def load(self):
+        # Alle Dateien stammen aus der beim Start veröffentlichten Version des Ordners
+        folder = current_version(C.POPULATION_FOLDER_PATH.value)
+        for row, country in enumerate(self.population_countries):
+            with open(f"{folder}/{country_file_name(country)}.json", 'r') as file:
+                data = json.load(file)
+
+            for year in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT):
+                self.counts[row, year - FIRST_YEAR] = float(data[str(year)]["count"])
+
+        self.log(f"{len(self.population_countries)} Bevölkerungsentwicklungen geladen")
+
+    # Zuordnen eines EM-DAT-Ländernamens zu einer Zeile der Matrix
+    def resolve(self, targeted_country):
+        population_country = self.resolver.resolve(targeted_country)
+
+        return None if population_country is None else self.rows[population_country]
+
+    # Erhalten der Bevölkerungszahl eines Landes in einem Jahr
+    def get(self, targeted_country, year) -> float:
+        row = self.resolve(targeted_country)
+        if row is None:
+            raise KeyError(f"No population data for {targeted_country}")
+
+        return float(self.counts[row, int(year) - FIRST_YEAR])
@@ -0,0 +1,193 @@
+import argparse
+import os
+from utils import LogProgress, Secure, PyCharmConstants, CSVReader, METRICS, LOG_BACKEND, FIRST_YEAR, YEAR_COUNT
+from cache import StageCache, code_version
+import dataset
+import disasters
+import engine
+import lookup
+import population
+import regions
+import resolver
+from disasters import DisasterDataConverter
+from population import PopulationDataConverter
+from evaluation import Evaluation
+
+
+# Festlegen der Konstanten
+C = PyCharmConstants
+
+
+# Zwischengespeicherte Attribute der Schritte
+DISASTER_ATTRIBUTES = ("converted_data", "countries", "disasters", "event_count")
+POPULATION_ATTRIBUTES = ("converted_data", "countries", "first_year")
+EVALUATION_ATTRIBUTES = ("disaster_types", "types_and_adpy", "types_and_adpy_n", "types_and_numbers", "types_and_deaths")
+
+# Zeitraum der Matrizen, Konstanten sind nicht Teil des Quelltexts der Schritte
+PERIOD = {"first_year": FIRST_YEAR, "year_count": YEAR_COUNT}
+
+
+class Pipeline(object):
+    """
+    Runs the disaster conversion, the population conversion and the evaluation in one process.
+    The converted data is handed from stage to stage in memory, writing the intermediate files is optional.
+    With a StageCache, stages whose input files, code and parameters are unchanged load their last output.
+
+    It takes the options of the run as arguments: Pipeline(write_intermediate, plot, workers, cache)
+    """
+    name = "Pipeline"
+    log = None
+
+    @LogProgress()
+    def __init__(self, write_intermediate=False, plot=False, workers=None, cache=None):
+        self.write_intermediate = write_intermediate
+        self.plot = plot
+        self.workers = workers
+        self.cache = cache
+
+        self.disaster_converter = None
+        self.population_converter = None
+        self.evaluation = None
+        self.keys = {}  # Schlüssel der Zwischenergebnisse je Schritt
+
+    # Laden eines zwischengespeicherten Ergebnisses in ein Objekt, sonst Berechnen und Zwischenspeichern
+    def run_stage(self, stage, target, attributes, compute, **key_arguments):
+        if self.cache is None:
+            compute()
+            return
+
+        self.keys[stage] = self.cache.key(stage, **key_arguments)
+        output = self.cache.get(self.keys[stage])
+        if output is not None:
+            for attribute in attributes:
+                setattr(target, attribute, output[attribute])
+            return
+
+        compute()
+        self.cache.put(self.keys[stage], {attribute: getattr(target, attribute) for attribute in attributes})
+
+    # Umwandeln der EM-DAT-Daten
+    @LogProgress()
+    def convert_disasters(self):
+        self.disaster_converter = DisasterDataConverter()
+
+        def compute():
+            self.disaster_converter.convert_data_from_file()
+            self.disaster_converter.extract_disasters()
+
+        self.run_stage(
+            "disasters", self.disaster_converter, DISASTER_ATTRIBUTES, compute,
+            files=[C.EMDAT_DISASTERS_DATA_PATH.value],
+            code=code_version(disasters, CSVReader)
+        )
+        self.disaster_converter.close_file()
+
+        if self.write_intermediate:
+            self.disaster_converter.write_data()
+
+    # Umwandeln der UN-Bevölkerungsdaten
+    @LogProgress()
+    def convert_population(self):
+        self.population_converter = PopulationDataConverter()
+
+        def compute():
+            self.population_converter.get_data_from_file()
+            self.population_converter.convert_data()
+            self.population_converter.extract_countries()
+            self.population_converter.calculate_missing_population_numbers()
+            self.population_converter.sort_data()
+            self.population_converter.calculate_development()
+
+        # Änderungen an den Abbildungen verändern die Daten nicht
+        converter = PopulationDataConverter
+        self.run_stage(
+            "population", self.population_converter, POPULATION_ATTRIBUTES, compute,
+            files=[C.UN_POPULATION_DATA_PATH.value],
+            code=code_version(
+                CSVReader, population.backcast, population.parse_population_counts, converter.convert_data,
+                converter.extract_countries, converter.calculate_missing_population_numbers, converter.sort_data,
+                converter.calculate_development
+            ),
+            parameters=PERIOD
+        )
+        self.population_converter.close_file()
+
+        if self.write_intermediate:
+            self.population_converter.write_data()
+
+        if self.plot:
+            self.population_converter.plot(workers=self.workers)
+
+    # Auswerten der im Speicher übergebenen Daten
+    @Secure("disaster_converter", "population_converter")
+    @LogProgress()
+    def evaluate(self):
+        self.evaluation = Evaluation(batch=True)
+
+        def compute():
+            self.evaluation.load_converted_data(
+                self.disaster_converter.converted_data, self.disaster_converter.disasters,
+                self.population_converter.converted_data
+            )
+            self.evaluation.generate_adpy_values(workers=self.workers or 1)
+
+        self.run_stage(
+            "evaluation", self.evaluation, EVALUATION_ATTRIBUTES, compute,
+            upstream=[self.keys.get("disasters"), self.keys.get("population")],
+            code=code_version(
+                engine, dataset, resolver, regions, lookup, Evaluation.load_converted_data, Evaluation.get_dataset,
+                Evaluation.build_event_table, Evaluation.resolve_countries, Evaluation.generate_adpy_values,
+                Evaluation.compute_values
+            ),
+            parameters=PERIOD
+        )
+        self.evaluation.generate_summit()
+        self.evaluation.generate_and_save_output()
+
+        if self.plot:
+            self.evaluation.plot_all(workers=self.workers)
+            self.evaluation.plot_univariate()
+            self.evaluation.plot_variate()
+
+    def run(self):
+        self.convert_disasters()
+        self.convert_population()
+        self.evaluate()
+
+
+# Prozess und Ablauf der gesamten Analyse
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Umwandlung und Auswertung in einem Prozess")
+    parser.add_argument(
+        "--write-intermediate", action="store_true", help="Zwischenergebnisse der Konverter zusätzlich sichern"
+    )
+    parser.add_argument("--plot", action="store_true", help="Abbildungen erstellen")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Anzahl der Prozesse für die Berechnung und die Abbildungen. Bei den EM-DAT-Daten ist die Berechnung "
+             "in mehreren Prozessen langsamer als in einem (etwa 40 ms mit 4 Prozessen gegenüber 3 ms)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Alle Schritte ohne Zwischenergebnisse berechnen")
+    parser.add_argument(
+        "--cache-size", type=int, default=1024, help="Größe des Ordners der Zwischenergebnisse in MB"
+    )
+    parser.add_argument("--quiet", action="store_true", help="Nur Sicherheitsmeldungen und Fehler ausgeben")
+    parser.add_argument("--json-log", action="store_true", help="Ausgabe als eine JSON-Zeile je Meldung")
+    parser.add_argument("--report", help="Sichern der Messwerte aller Schritte als JSON-Datei")
+    parser.add_argument("--profile", help="Schritt, der mit cProfile untersucht wird, z. B. PopulationDataConverter.convert_data")
+    parser.add_argument("--profile-output", help="Datei für die Statistiken von --profile statt der Ausgabe")
+    arguments = parser.parse_args()
+
+    os.environ["MPLBACKEND"] = "Agg"
+    LOG_BACKEND.configure(json_lines=arguments.json_log, quiet=arguments.quiet)
+    if arguments.profile:
+        METRICS.enable_profiling(arguments.profile, arguments.profile_output)
+
+    stage_cache = None
+    if not arguments.no_cache:
+        stage_cache = StageCache(C.STAGE_CACHE_FOLDER_PATH.value, arguments.cache_size * 1024 ** 2)
+
+    Pipeline(arguments.write_intermediate, arguments.plot, arguments.workers, stage_cache).run()
+
+    if arguments.report:
+        METRICS.write_report(arguments.report)
@@ -1,11 +1,48 @@
-import json
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-from utils import LogProgress, Secure, PyCharmConstants, CSVReader, check_dir
+from utils import LogProgress, Secure, PyCharmConstants, CSVReader, FIRST_YEAR, YEAR_COUNT, check_dir, country_file_name
+from store import json_writers, population_matrix_writers, publish_files
 
 
 # Festlegen der Konstanten
 C = PyCharmConstants
+LAST_YEAR = FIRST_YEAR + YEAR_COUNT - 1
+
+
+def backcast(base, factors, start_year, base_year=1950):
+    """
+    Back-extrapolates the values of all rows at once, the value of a year is the value of the following year
+    divided by the factor of its row
+    :param base: Array of the values of base_year per row
+    :param factors: Array of the yearly change per row
+    :param start_year: First year to calculate
+    :param base_year: Year of the given values
+    :return: (rows x years) array of the values from start_year to base_year - 1
+    """
+    base = np.asarray(base, dtype=np.float64)
+    factors = np.asarray(factors, dtype=np.float64)
+    steps = base_year - start_year
+
+    # Nicht definierte Veränderungen (z. B. durch eine Bevölkerung von 0) werden als gleichbleibend angenommen
+    factors = np.where(np.isfinite(factors) & (factors != 0), factors, 1.0)
+
+    divisors = np.cumprod(np.repeat(factors[:, np.newaxis], steps, axis=1), axis=1)
+    values = base[:, np.newaxis] / divisors
+
+    return values[:, ::-1]
+
+
+def parse_population_counts(values):
+    """
+    Converts the population values of the UN data, given in thousands with up to three decimals, into persons
+    :param values: Sequence of the values as strings, e.g. "1234.5" for 1234500 persons
+    :return: int64 array of the population counts
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Bei höchstens drei Nachkommastellen ist das Ergebnis nach dem Runden exakt
+    return np.rint(np.array(values).astype(np.float64) * 10 ** 3).astype(np.int64)
 
 
 class PopulationDataConverter(CSVReader):
@@ -17,24 +54,22 @@ class PopulationDataConverter(CSVReader):
         super().__init__(C.UN_POPULATION_DATA_PATH.value, ',')
 
         self.countries = []
+        self.first_year = FIRST_YEAR
 
     # Auswerten der aus der Datei bezogenen Daten
     @Secure("data")
-    @LogProgress()
+    @LogProgress("data")
     def convert_data(self):
-        for row in self.data:
-            country = row[1]
-            year = row[4]
-            count = int(str(row[8]).replace('.', ''))
-            if len(str(row[8]).split('.')) != 2:
-                count *= 10 ** 3
-            elif len(str(row[8]).split('.')[1]) - 3 != 0:
-                count *= 10 ** (3 - len(str(row[8]).split('.')[1]))
+        # Herausfiltern der Vorausberechnungen nach 2020 vor dem Umwandeln der Werte
+        years = np.array([row[4] for row in self.data]).astype(np.int64)
+        rows = [self.data[ind] for ind in np.flatnonzero(years <= LAST_YEAR)]
 
-            density = float(str(row[9]))
+        counts = parse_population_counts([row[8] for row in rows]).tolist()
+        densities = np.array([row[9] for row in rows]).astype(np.float64).tolist()
 
-            if int(year) > 2020:
-                continue
+        for row, count, density in zip(rows, counts, densities):
+            country = row[1]
+            year = row[4]
 
             if country in self.converted_data:
                 self.converted_data[country][year] = {"count": count, "density": density}
@@ -43,67 +78,57 @@ class PopulationDataConverter(CSVReader):
 
     # Extrahieren der Länder zum Erstellen einer Liste
     @Secure("converted_data")
-    @LogProgress()
+    @LogProgress("countries")
     def extract_countries(self):
         for country in self.converted_data:
             self.countries.append(country)
 
     # Berechnen der ungefähren Bevölkerungszahlen vor 1950
     @Secure("converted_data")
-    @LogProgress()
-    def calculate_missing_population_numbers(self):
-        # Für jedes aus den Daten ausgelesene Land erfolgen diese Schritte
-        for country in self.converted_data:
-            years = []
-            for year in ["1950", "1951", "1952", "1953", "1954", "1955"]:
-                years.append(self.converted_data[country][year])
-
-            # Erstellen von Matrizen zum Speichern der Werte
-            real_numbers = np.zeros((2, 5))
-            comparison_numbers = np.zeros((2, 5))
-
-            # Zuordnen der Werte zu den richtigen Matrizen
-            for ind, year in enumerate(years):
-                if ind < 5:
-                    real_numbers[0, ind] = year["count"]
-                    real_numbers[1, ind] = year["density"]
-                if ind > 0:
-                    comparison_numbers[0, ind - 1] = year["count"]
-                    comparison_numbers[1, ind - 1] = year["density"]
-
-            # Berechnen der Veränderung
-            divided = np.divide(comparison_numbers, real_numbers)
-
-            growth_avg = float(np.average(divided[0, :]))
-            density_avg = float(np.average(real_numbers[1, :]))
-
-            new_years = [str(year) for year in range(1920, 1950)]
-            new_years.reverse()
-
-            # Kalkulation der Jahre 1920 bis 1950 und speichern der Werte
-            population = self.converted_data[country]["1950"]["count"]
-            density = self.converted_data[country]["1950"]["density"]
-            for year in new_years:
-                population = int((population / growth_avg))
-                density = int((density / density_avg))
+    @LogProgress("converted_data")
+    def calculate_missing_population_numbers(self, start_year=FIRST_YEAR):
+        countries = list(self.converted_data)
+
+        # Erstellen von Matrizen (Länder x Jahre) der Werte von 1950 bis 1955
+        years = ["1950", "1951", "1952", "1953", "1954", "1955"]
+        counts = np.array([[self.converted_data[c][y]["count"] for y in years] for c in countries], dtype=np.float64)
+        densities = np.array([[self.converted_data[c][y]["density"] for y in years] for c in countries], dtype=np.float64)
+
+        # Berechnen der durchschnittlichen Veränderung aller Länder
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth_avg = np.average(np.divide(counts[:, 1:], counts[:, :5]), axis=1)
+        density_avg = np.average(densities[:, :5], axis=1)
+
+        # Kalkulation der Jahre vor 1950 für alle Länder gleichzeitig
+        populations = backcast(counts[:, 0], growth_avg, start_year).astype(np.int64).tolist()
+
+        # Die Dichte kann bei einem Durchschnitt unter 1 den Wertebereich von int64 überschreiten
+        densities = [[int(value) for value in row] for row in np.trunc(backcast(densities[:, 0], density_avg, start_year))]
+
+        # Speichern der Werte
+        new_years = [str(year) for year in range(start_year, 1950)]
+        for row, country in enumerate(countries):
+            for ind, year in enumerate(new_years):
                 self.converted_data[country][year] = {
-                    "count": population,
-                    "density": density
+                    "count": populations[row][ind],
+                    "density": densities[row][ind]
                 }
 
+        self.first_year = start_year
+
     # Sortieren Daten nach Jahreszahlen
     @Secure("converted_data")
-    @LogProgress()
+    @LogProgress("converted_data")
     def sort_data(self):
         for country in self.converted_data:
             local_copy = {}
-            for y in range(1920, 2021):
+            for y in range(self.first_year, LAST_YEAR + 1):
                 local_copy[str(y)] = self.converted_data[country][str(y)]
             self.converted_data[country] = local_copy
 
     # Sichern der Daten im lokalen Speicher
     @Secure("converted_data")
-    @LogProgress()
+    @LogProgress("converted_data")
     def calculate_development(self):
         for country in self.converted_data:
             development = []
@@ -112,42 +137,49 @@ class PopulationDataConverter(CSVReader):
 
             self.converted_data[country]["development"] = development
 
-    # Sichern der Daten in Form von JSON-Dateien
+    # Sichern der Daten in Form von JSON-Dateien und als speicherabbildbare Matrix, als eine Version des Ordners
     @Secure("converted_data")
-    @LogProgress()
+    @LogProgress("converted_data")
     def write_data(self):
         if not check_dir(C.POPULATION_FOLDER_PATH.value):
             return
 
-        with open(C.POPULATION_COUNTRIES_REGISTER_PATH.value, 'w+') as file:
-            json.dump(self.countries, file)
-
+        files = {os.path.basename(C.POPULATION_COUNTRIES_REGISTER_PATH.value): self.countries}
         for country in self.converted_data:
-            loc = str(country).replace('/', '_').replace(':', ' ').lower()
-            with open(f"{C.POPULATION_FOLDER_PATH.value}/{loc}.json", 'w+') as file:
-                json.dump(self.converted_data[country], file)
+            files[f"{country_file_name(country)}.json"] = self.converted_data[country]
+
+        writers = json_writers(files)
+        writers.update(population_matrix_writers(
+            C.POPULATION_MATRIX_PATH.value, C.POPULATION_DENSITY_MATRIX_PATH.value,
+            C.POPULATION_MATRIX_INDEX_PATH.value, self.converted_data
+        ))
+        publish_files(C.POPULATION_FOLDER_PATH.value, writers)
 
-    # Erstellen der graphischen Auswertung
+    # Erstellen der graphischen Auswertung, optional nur für ausgewählte Länder
     @Secure("converted_data")
-    @LogProgress()
-    def plot(self):
+    @LogProgress("converted_data")
+    def plot(self, countries=None, workers=None):
+        # matplotlib wird erst beim Erstellen der Abbildungen geladen
+        from rendering import build_population_chart, render_charts
+
         if not check_dir(C.POPULATION_CHARTS_FOLDER_PATH.value):
             return
 
-        for country in self.converted_data:
-            fig, ax = plt.subplots()
+        if countries is None:
+            countries = list(self.converted_data)
 
-            ax.set_xlabel('Jahre')
-            ax.set_ylabel('Menschen')
-            ax.set_title('Veränderung der Bevölkerung - ' + country)
+        jobs = []
+        for country in countries:
+            if country not in self.converted_data:
+                self.log("Keine Daten für %s", country, log_type="ERROR")
+                continue
 
             values = self.converted_data[country]['development']
-            ax.plot([i for i in range(1920, 2021)], values)
-
-            fname = str(country).replace('/', '_').replace(':', ' ').lower()
-            fig.savefig(f"{C.POPULATION_CHARTS_FOLDER_PATH.value}/{fname}.pdf")
+            fname = country_file_name(country)
+            jobs.append((build_population_chart, (country, values, self.first_year), f"{C.POPULATION_CHARTS_FOLDER_PATH.value}/{fname}.pdf"))
 
-            plt.close(fig)
+        render_charts(jobs, workers)
+        self.log(f"{len(jobs)} Diagramme erstellt")
 
 
 # Prozess und Ablauf der Analyse
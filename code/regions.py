@@ -0,0 +1,176 @@
+import json
+import re
+import numpy as np
+from utils import YEAR_COUNT
+
+
+# Geographische Regionen und Kontinente der UN-Bevölkerungsdaten (M49), die als eigene Reihe enthalten sind
+GEOGRAPHIC_REGIONS = {
+    "world", "africa", "asia", "europe", "oceania", "americas", "latin america and the caribbean",
+    "northern america", "eastern africa", "middle africa", "northern africa", "southern africa", "western africa",
+    "sub-saharan africa", "central asia", "eastern asia", "south-eastern asia", "southern asia", "western asia",
+    "eastern europe", "northern europe", "southern europe", "western europe", "caribbean", "central america",
+    "south america", "australia/new zealand", "melanesia", "micronesia", "polynesia",
+    "central and southern asia", "eastern and south-eastern asia", "northern africa and western asia",
+    "europe and northern america", "oceania (excluding australia and new zealand)"
+}
+
+# Bestandteile der Namen von Länder- und Organisationsgruppen
+AGGREGATE_PATTERN = re.compile(
+    r":|\(and dependencies\)|\bregions?\b|\bcountries\b|\bincome\b|\bgroups?\b|\bunion\b|\bmember states\b|"
+    r"\bcommission\b|\beconomic\b|\bprogramme\b|\bworld\b|\bdeveloped\b|\bdeveloping\b|\bland-locked\b|"
+    r"\bsmall island\b|\bsids\b|\bldcs?\b|\bunicef\b|\bwho\b|\bsdg\b|\bcommunity\b|\bassociation\b|"
+    r"\balliance\b|\binitiative\b|\bagreement\b|\bcommonwealth\b|\bcooperation\b|\bco-operation\b|\bcouncil\b|"
+    r"\borgani[sz]ation\b|\bterritories\b|\bmarket\b|\bfree trade\b|\bbrics?\b|\(\w* ?\d+\)",
+    re.IGNORECASE
+)
+
+
+def is_aggregate(name):
+    """
+    Detects population series that are not a single country but a region or a group of countries,
+    e.g. "Africa", "World", "European Union (EU 28)" or "WHO: European Region (EURO)"
+    :param name: Name of a population series
+    :return: True if the series is an aggregate
+    """
+    name = str(name)
+    return name.lower() in GEOGRAPHIC_REGIONS or AGGREGATE_PATTERN.search(name) is not None
+
+
+class RegionIndex(object):
+    """
+    Membership of the countries of the population index in regions, kept as a sparse (country x region)
+    matrix in coordinate form: every member is one pair of a country row and a region column.
+    Rolling up per-country values to all regions is one sparse matrix multiply.
+
+    It takes the number of countries and the region names as arguments: RegionIndex(country_count, regions)
+    """
+
+    def __init__(self, country_count, regions=()):
+        self.country_count = country_count
+        self.regions = list(regions)
+        self.countries = np.zeros(0, dtype=np.int64)  # Zeile des Landes je Mitgliedschaft
+        self.columns = np.zeros(0, dtype=np.int64)  # Spalte der Region je Mitgliedschaft
+
+    def add(self, region, rows):
+        """
+        Adds countries to a region, the region is created if it does not exist yet
+        :param region: Name of the region
+        :param rows: Rows of the member countries in the population index
+        :return: nothing
+        """
+        if region not in self.regions:
+            self.regions.append(region)
+
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        self.countries = np.concatenate((self.countries, rows))
+        self.columns = np.concatenate((self.columns, np.full(len(rows), self.regions.index(region), dtype=np.int64)))
+
+        # Doppelte Mitgliedschaften werden nur einmal gezählt
+        pairs = np.unique(np.stack((self.countries, self.columns)), axis=1)
+        self.countries, self.columns = pairs[0], pairs[1]
+
+    def members(self, region):
+        """
+        :param region: Name of the region
+        :return: Rows of the member countries
+        """
+        return self.countries[self.columns == self.regions.index(region)]
+
+    def rollup(self, values):
+        """
+        Sums per-country values over the members of every region
+        :param values: Array shaped (countries x ...), e.g. (countries x years)
+        :return: Array shaped (regions x ...)
+        """
+        values = np.asarray(values)
+        result = np.zeros((len(self.regions),) + values.shape[1:], dtype=np.result_type(values, np.float64))
+        np.add.at(result, self.columns, values[self.countries])
+
+        return result
+
+    def aggregate(self, table, population_counts):
+        """
+        Computes ADPY values, deaths and number of events for every region, type and year (Formel 2).
+        The sums of the population shares, deaths and events are first built per country and then rolled up
+        in one step; the ADPY value of a region is its sum of shares divided by its number of events.
+        :param table: EventTable
+        :param population_counts: (country x year) matrix of population counts
+        :return: Tuple of (adpys, numbers, deaths), each shaped (regions x types x years)
+        """
+        types = len(table.type_names)
+        size = self.country_count * types * YEAR_COUNT
+        cells = (table.rows * types + table.types) * YEAR_COUNT + table.years
+
+        shares = table.deaths / population_counts[table.rows, table.years]
+        sums = np.stack((
+            np.bincount(cells, weights=shares, minlength=size),
+            np.bincount(cells, minlength=size).astype(np.float64),
+            np.bincount(cells, weights=table.deaths, minlength=size)
+        )).reshape(3, self.country_count, types, YEAR_COUNT)
+
+        shares, numbers, deaths = np.moveaxis(self.rollup(np.moveaxis(sums, 0, 1)), 1, 0)
+        adpys = np.divide(shares, numbers, out=np.zeros_like(shares), where=numbers > 0)
+
+        return adpys, numbers, deaths
+
+    @classmethod
+    def from_event_table(cls, table, population_index, membership=None):
+        """
+        Builds the regions "World" (all single countries), one region per EM-DAT continent of the events
+        and optionally further regions of a membership dict
+        :param table: EventTable, the continents of its events assign the countries to continents
+        :param population_index: PopulationIndex whose rows are the countries
+        :param membership: Dict of region -> names of the member population series, e.g. from a JSON file
+        :return: RegionIndex
+        """
+        names = population_index.population_countries
+        countries = np.array([not is_aggregate(name) for name in names], dtype=bool)
+        index = cls(len(names))
+
+        index.add("World", np.flatnonzero(countries))
+
+        # Ereignisse, deren Land nur einer Ländergruppe zugeordnet werden konnte, zählen zu keiner Region
+        if len(table) > 0:
+            continents, codes = table.field("continent")
+            for code, continent in enumerate(continents):
+                rows = table.rows[codes == code]
+                index.add(continent, rows[countries[rows]])
+
+        for region, members in (membership or {}).items():
+            index.add(region, [population_index.rows[name] for name in members if name in population_index.rows])
+
+        return index
+
+    def save(self, path):
+        """
+        Saves the index as .npz file
+        :param path: Target file
+        :return: nothing
+        """
+        with open(path, 'wb') as file:
+            np.savez(
+                file, countries=self.countries, columns=self.columns,
+                regions=np.array(self.regions, dtype=str), country_count=np.array(self.country_count)
+            )
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: File written by save
+        :return: RegionIndex
+        """
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(int(data["country_count"]), data["regions"].tolist())
+            index.countries, index.columns = data["countries"], data["columns"]
+
+        return index
+
+
+def load_membership(path):
+    """
+    :param path: JSON file of {region: [names of the member population series]}
+    :return: Dict of the memberships
+    """
+    with open(path, 'r') as file:
+        return json.load(file)
@@ -0,0 +1,122 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+import matplotlib.pyplot as plt
+from utils import FIRST_YEAR, YEAR_COUNT, LOG_BACKEND
+
+
+YEARS = [i for i in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT)]
+
+
+# Erstellen der einzelnen Diagramme
+def build_population_chart(country, values, first_year=FIRST_YEAR):
+    fig, ax = plt.subplots()
+
+    ax.set_xlabel('Jahre')
+    ax.set_ylabel('Menschen')
+    ax.set_title('Veränderung der Bevölkerung - ' + country)
+
+    ax.plot([i for i in range(first_year, first_year + len(values))], values)
+
+    return fig
+
+
+def build_type_chart(adpy_n, numbers, deaths):
+    standard_color = 'tab:blue'
+    times_color = 'tab:red'
+    deaths_color = 'k'
+
+    fig, axs = plt.subplots(2, 1, constrained_layout=True)
+
+    for ax in axs.flat:
+        ax.set_xlabel('Jahre')
+        ax.set_ylabel('ADPY-Werte', color=standard_color)
+        ax.grid(True, linestyle='-.')
+
+    axs[0].plot(YEARS, adpy_n, color=standard_color)
+    axs[0].tick_params(axis='y', labelcolor=standard_color)
+    axs[0].set_title("Darstellung mit Häufigkeit")
+
+    ax2 = axs[0].twinx()
+    ax2.set_ylabel("Häufigkeit pro Jahr", color=times_color)
+    ax2.plot(YEARS, numbers, color=times_color, linewidth=1)
+    ax2.tick_params(axis='y', labelcolor=times_color)
+
+    axs[1].plot(YEARS, adpy_n, color=standard_color)
+    axs[1].tick_params(axis='y', labelcolor=standard_color)
+    axs[1].set_title("Darstellung mit Todesfällen")
+
+    ax4 = axs[1].twinx()
+    ax4.set_ylabel("Todesfälle pro Jahr", color=deaths_color)
+    ax4.plot(YEARS, deaths, color=deaths_color, linewidth=1)
+    ax4.tick_params(axis='y', labelcolor=deaths_color)
+
+    fig.tight_layout()
+
+    return fig
+
+
+def build_twin_chart(title, y_name1, y_name2, y1, y2):
+    fig, ax = plt.subplots()
+    ax.set(title=title)
+
+    color = 'tab:blue'
+    ax.set_xlabel('Jahre')
+    ax.set_ylabel(y_name1, color=color)
+    ax.plot(YEARS, y1, color=color)
+    ax.tick_params(axis='y', labelcolor=color)
+    ax.grid(True, linestyle='-.')
+
+    ax2 = ax.twinx()
+
+    color = 'tab:red'
+    ax2.set_ylabel(y_name2, color=color)
+    ax2.plot(YEARS, y2, color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    fig.tight_layout()
+
+    return fig
+
+
+# Rendern der Diagramme
+def use_agg_backend():
+    """
+    Switches matplotlib of a worker process to the non-interactive Agg backend and sets up its log output
+    :return: nothing
+    """
+    LOG_BACKEND.configure_worker()
+    matplotlib.use("Agg", force=True)
+
+
+def render(job):
+    """
+    Builds, saves and closes one chart
+    :param job: Tuple of (builder, args, path), builder is one of the build_* functions
+    :return: Tuple of the path of the saved chart and its render time in seconds
+    """
+    builder, args, path = job
+    started = time.perf_counter()
+
+    fig = builder(*args)
+    fig.savefig(path)
+    plt.close(fig)
+
+    return path, time.perf_counter() - started
+
+
+def render_charts(jobs, workers=None):
+    """
+    Renders chart jobs in a process pool, each worker uses the Agg backend
+    :param jobs: List of (builder, args, path) tuples
+    :param workers: Number of processes, all cores if None, in this process if 1
+    :return: List of (path, render time) of the saved charts in the order of the jobs
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return [render(job) for job in jobs]
+
+    chunk_size = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=use_agg_backend) as executor:
+        return list(executor.map(render, jobs, chunksize=chunk_size))
@@ -0,0 +1,72 @@
+import numpy as np
+from utils import YEAR_COUNT
+
+
+def bootstrap_replicates(table, population_counts, replicates=1000, seed=0, batch_size=250):
+    """
+    Generates bootstrap replicates of the ADPY values, deaths and number of events of every type and year.
+    For every replicate the events of each year are drawn with replacement from all events of that year,
+    so the number of events per type varies between the replicates. Replicates are computed in batches,
+    each batch in one pass over the event arrays.
+    :param table: EventTable
+    :param population_counts: (country x year) matrix of population counts
+    :param replicates: Number of replicates
+    :param seed: Seed of the random generator
+    :param batch_size: Number of replicates computed at once, bounds the memory to batch_size x events
+    :return: Generator of (adpys, numbers, deaths) tuples, each shaped (batch x types x years)
+    """
+    rng = np.random.default_rng(seed)
+    types = len(table.type_names)
+    size = types * YEAR_COUNT
+
+    # Ereignisse nach Jahren sortiert, jedes Jahr ist ein zusammenhängender Block
+    order = np.argsort(table.years, kind="stable")
+    years = table.years[order]
+    cells = (table.types * YEAR_COUNT + table.years)[order]
+    deaths = table.deaths[order]
+    shares = deaths / population_counts[table.rows, table.years][order]
+
+    year_sizes = np.bincount(years, minlength=YEAR_COUNT)
+    year_starts = np.concatenate(([0], np.cumsum(year_sizes)[:-1]))
+    starts, sizes = year_starts[years], year_sizes[years]
+
+    for first in range(0, replicates, batch_size):
+        batch = min(batch_size, replicates - first)
+
+        # Jede Stelle eines Jahres wird durch ein zufälliges Ereignis desselben Jahres ersetzt
+        drawn = starts + (rng.random((batch, len(years))) * sizes).astype(np.int64)
+        drawn_cells = (np.arange(batch)[:, np.newaxis] * size + cells[drawn]).ravel()
+
+        numbers = np.bincount(drawn_cells, minlength=batch * size).astype(np.float64)
+        sums = np.bincount(drawn_cells, weights=deaths[drawn].ravel(), minlength=batch * size)
+        adpys = np.bincount(drawn_cells, weights=shares[drawn].ravel(), minlength=batch * size)
+
+        # Formel 2: Summe der Anteile geteilt durch die Anzahl der Ereignisse der Partition
+        adpys = np.divide(adpys, numbers, out=np.zeros_like(adpys), where=numbers > 0)
+
+        shape = (batch, types, YEAR_COUNT)
+        yield adpys.reshape(shape), numbers.reshape(shape), sums.reshape(shape)
+
+
+def bootstrap_intervals(table, population_counts, replicates=1000, confidence=0.95, seed=0, batch_size=250):
+    """
+    Computes percentile intervals of the ADPY values, deaths and number of events from bootstrap replicates
+    :param table: EventTable
+    :param population_counts: (country x year) matrix of population counts
+    :param replicates: Number of replicates
+    :param confidence: Confidence level of the intervals, e.g. 0.95
+    :param seed: Seed of the random generator
+    :param batch_size: Number of replicates computed at once
+    :return: Dict with "adpys", "numbers" and "deaths", each a tuple of (lower, upper) bounds shaped (types x years)
+    """
+    shape = (replicates, len(table.type_names), YEAR_COUNT)
+    samples = {key: np.empty(shape, dtype=np.float32) for key in ("adpys", "numbers", "deaths")}
+
+    first = 0
+    for adpys, numbers, deaths in bootstrap_replicates(table, population_counts, replicates, seed, batch_size):
+        batch = slice(first, first + len(adpys))
+        samples["adpys"][batch], samples["numbers"][batch], samples["deaths"][batch] = adpys, numbers, deaths
+        first += len(adpys)
+
+    bounds = [(1 - confidence) / 2, (1 + confidence) / 2]
+    return {key: tuple(np.quantile(values, bounds, axis=0)) for key, values in samples.items()}
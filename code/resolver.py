@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import tempfile
+from utils import LogProgress, FIRST_YEAR, YEAR_COUNT
+from regions import is_aggregate, AGGREGATE_PATTERN, GEOGRAPHIC_REGIONS
+
+
+# Korrekturen der EM-DAT-Ländernamen auf die Namen der UN-Bevölkerungsdaten
+COUNTRY_CORRECTIONS = {
+    "Azores Islands": "Portugal", "Côte d’Ivoire": "ivoire", "Soviet Union": "Russian Federation",
+    "Korea (the Republic of)": "Republic of Korea",
+    "Tanzania, United Republic of": "United Republic of Tanzania",
+    "Yugoslavia": "Serbia", "Palestine, State of": "State of Palestine",
+    "Korea (the Democratic People's Republic of)": "Dem. People's Republic of Korea", "Swaziland": "Eswatini",
+    "Virgin Island (U.S.)": "United States Virgin Islands",
+    "Virgin Island (British)": "United States Virgin Islands",
+    "Macedonia (the former Yugoslav Republic of)": "North Macedonia", "Czech Republic (the)": "Czechia",
+    "Moldova (the Republic of)": "Republic of Moldova", "Canary Is": "Spain",
+    "Taiwan (Province of China)": "China, Taiwan Province of China",
+    "United Kingdom of Great Britain and Northern Ireland (the)": "United Kingdom",
+    "Congo (the Democratic Republic of the)": "Democratic Republic of the Congo",
+    "Micronesia (Federated States of)": "Micronesia (Fed. States of)"
+}
+
+# Version der Zuordnungsregeln, bei jeder Änderung von match_name, match_substring oder is_aggregate zu erhöhen
+RESOLVER_VERSION = 2
+
+
+def country_isos(disasters):
+    """
+    Collects the distinct pairs of country name and ISO code of disaster data
+    :param disasters: Disaster data nested as {type: {year: {ident: event}}}
+    :return: List of (country, iso) tuples in the order of first appearance
+    """
+    pairs = {}
+    for d_type in disasters:
+        for events in disasters[d_type].values():
+            for event in events.values():
+                pairs[(str(event["country"]), str(event["iso"]))] = None
+
+    return list(pairs)
+
+
+class CountryResolver(object):
+    """
+    Resolution table from EM-DAT country names to the names of the UN population data.
+    Names are resolved once in the order exact match, correction table, ISO code, substring match;
+    afterwards every lookup is a dict access.
+
+    It takes the country register of the population data as argument: CountryResolver(population_countries)
+    """
+    name = "CountryResolver"
+    log = None
+
+    @LogProgress()
+    def __init__(self, population_countries):
+        self.population_countries = list(population_countries)
+        self.lower_names = {}
+        for country in self.population_countries:
+            self.lower_names.setdefault(str(country).lower(), country)
+
+        self.table = {}  # EM-DAT-Ländername -> {"iso", "population", "method"}
+
+    def fingerprint(self):
+        """
+        :return: Digest of the population register, the correction table, the aggregate detection, the period
+                 and the resolution rules the table was built for
+        """
+        description = {
+            "population_countries": self.population_countries,
+            "corrections": COUNTRY_CORRECTIONS,
+            "aggregates": [sorted(GEOGRAPHIC_REGIONS), AGGREGATE_PATTERN.pattern],
+            "period": [FIRST_YEAR, YEAR_COUNT],
+            "version": RESOLVER_VERSION
+        }
+        return hashlib.sha1(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # Aufbau der Tabelle für alle Länder der Katastrophendaten
+    @LogProgress()
+    def build(self, pairs):
+        self.add(pairs)
+        self.log(f"{len(self.table)} Ländernamen zugeordnet, davon {len(self.unresolved())} ohne Bevölkerungsdaten")
+
+    # Auflösen der noch nicht in der Tabelle enthaltenen Namen
+    def add(self, pairs):
+        pairs = [(country, iso) for country, iso in pairs if country not in self.table]
+
+        # Exakte Übereinstimmung und Korrekturtabelle
+        for country, iso in pairs:
+            self.table[country] = self.match_name(country, iso)
+
+        # Zuordnung über den ISO-Code bereits aufgelöster Namen
+        iso_names = {}
+        for entry in self.table.values():
+            if entry["population"] is not None and entry["iso"]:
+                iso_names.setdefault(entry["iso"], entry["population"])
+
+        # ISO-Code und zuletzt die Suche nach Teilzeichenketten
+        for country, iso in pairs:
+            if self.table[country]["population"] is not None:
+                continue
+
+            if iso in iso_names:
+                self.table[country] = {"iso": iso, "population": iso_names[iso], "method": "iso"}
+            else:
+                self.table[country] = {"iso": iso, "population": self.match_substring(country), "method": "substring"}
+
+        for country, _ in pairs:
+            population = self.table[country]["population"]
+            if population is None:
+                self.log("Keine Bevölkerungsdaten für %s", country, log_type="ERROR")
+            elif is_aggregate(population):
+                # Die Bevölkerung einer Region oder Ländergruppe verfälscht die ADPY-Werte des Landes
+                self.table[country]["aggregate"] = True
+                self.log("%s wurde der Ländergruppe %s zugeordnet", country, population, log_type="ERROR")
+
+    def match_name(self, country, iso):
+        # EM-DAT hängt bei einigen Ländern den Artikel als "(the)" an
+        name = str(country).lower()
+        if name.endswith(" (the)"):
+            name = name[:-len(" (the)")]
+
+        if name in self.lower_names:
+            return {"iso": iso, "population": self.lower_names[name], "method": "exact"}
+
+        if country in COUNTRY_CORRECTIONS:
+            corrected = COUNTRY_CORRECTIONS[country]
+            if str(corrected).lower() in self.lower_names:
+                population = self.lower_names[str(corrected).lower()]
+            else:
+                population = self.match_substring(corrected)
+            return {"iso": iso, "population": population, "method": "correction"}
+
+        return {"iso": iso, "population": None, "method": None}
+
+    # Einzelne Länder werden vor Regionen und Ländergruppen mit passendem Namen gewählt
+    def match_substring(self, country):
+        matches = [
+            given_country for given_country in self.population_countries
+            if str(country).lower() in str(given_country).lower()
+            or str(given_country).lower() in str(country).lower()
+        ]
+        for given_country in matches:
+            if not is_aggregate(given_country):
+                return given_country
+
+        return matches[0] if matches else None
+
+    def aggregates(self):
+        """
+        :return: List of the EM-DAT country names resolved to a region or a group of countries
+        """
+        return [
+            country for country, entry in self.table.items()
+            if entry["population"] is not None and is_aggregate(entry["population"])
+        ]
+
+    def resolve(self, country):
+        """
+        :param country: EM-DAT country name
+        :return: Name of the population series or None if the country could not be resolved
+        """
+        if country not in self.table:
+            self.add([(country, "")])
+
+        return self.table[country]["population"]
+
+    def unresolved(self):
+        """
+        :return: List of the EM-DAT country names without population series
+        """
+        return [country for country, entry in self.table.items() if entry["population"] is None]
+
+    def save(self, path):
+        """
+        Saves the table as JSON, including its fingerprint. The file is replaced instead of overwritten, as it
+        can be hard-linked into older published versions of its folder, see store.publish_files
+        :param path: Target file
+        :return: nothing
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump({"fingerprint": self.fingerprint(), "countries": self.table}, file, indent=1)
+        os.replace(temporary, path)
+
+    def load(self, path):
+        """
+        Takes over a table saved with save, if it was built for the same population register and rules
+        :param path: File written by save
+        :return: True if the table was taken over
+        """
+        with open(path, 'r') as file:
+            saved = json.load(file)
+
+        if saved.get("fingerprint") != self.fingerprint():
+            return False
+
+        self.table.update(saved["countries"])
+        return True
@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from utils import LogProgress, PyCharmConstants, FIRST_YEAR, YEAR_COUNT, LOG_BACKEND, basic_log
+from engine import CATEGORICAL_FIELDS, aggregate
+from evaluation import Evaluation
+
+
+# Festlegen der Konstanten
+C = PyCharmConstants
+
+# Dateien, deren Änderung ein Neuladen auslöst, mit und ohne gepackte Speicher
+STORE_FILES = [C.DISASTER_STORE_PATH, C.POPULATION_MATRIX_PATH, C.POPULATION_MATRIX_INDEX_PATH]
+JSON_FILES = [C.DISASTER_TYPE_REGISTER_PATH, C.POPULATION_COUNTRIES_REGISTER_PATH]
+
+
+def file_signature():
+    """
+    :return: Tuple of (path, modification time, size) of the files of the published dataset
+    """
+    files = STORE_FILES if all(os.path.exists(path.value) for path in STORE_FILES) else JSON_FILES
+    signature = []
+    for path in files:
+        if os.path.exists(path.value):
+            stat = os.stat(path.value)
+            signature.append((path.value, stat.st_mtime_ns, stat.st_size))
+
+    return tuple(signature)
+
+
+class Snapshot(object):
+    """
+    Evaluated dataset kept resident by the QueryService, together with the cached answers to its queries.
+    A snapshot is never changed after it was built, a reload replaces it as a whole.
+
+    It takes the loaded Evaluation, the signature of its files and the number of cached answers as arguments:
+    Snapshot(evaluation, signature, cache_size)
+    """
+
+    def __init__(self, evaluation, signature, cache_size=256):
+        self.table = evaluation.event_table
+        self.population_counts = evaluation.population_index.counts
+        self.signature = signature
+        self.loaded = time.time()
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def query(self, types=None, years=None, filters=None):
+        """
+        :param types: Names of the disaster types, all types if None
+        :param years: Tuple of the first and the last year, all years if None
+        :param filters: Dict of categorical field -> wanted values, e.g. {"continent": ["Asia"]}
+        :return: Dict with the years and the ADPY values, number of events and deaths per type
+        """
+        types = list(self.table.type_names if types is None else types)
+        unknown = [d_type for d_type in types if d_type not in self.table.type_names]
+        if unknown:
+            raise KeyError(f"Unknown disaster type {', '.join(unknown)}")
+
+        first, last = years if years is not None else (FIRST_YEAR, FIRST_YEAR + YEAR_COUNT - 1)
+        filters = {field: sorted(values) for field, values in (filters or {}).items()}
+        key = (tuple(types), first, last, tuple(sorted((field, tuple(values)) for field, values in filters.items())))
+
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        result = self.compute(types, first, last, filters)
+
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return result
+
+    def compute(self, types, first, last, filters):
+        table = self.table
+        mask = table.isin("type", types)
+        for field, values in filters.items():
+            mask &= table.isin(field, values)
+
+        adpys, numbers, deaths = aggregate(table.select(mask), self.population_counts)
+        columns = slice(max(first - FIRST_YEAR, 0), max(last - FIRST_YEAR + 1, 0))
+
+        result = {"years": list(range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT))[columns], "types": {}}
+        for d_type in types:
+            ind = table.type_names.index(d_type)
+            result["types"][d_type] = {
+                "adpy": adpys[ind, columns].tolist(),
+                "numbers": numbers[ind, columns].tolist(),
+                "deaths": deaths[ind, columns].tolist()
+            }
+
+        return result
+
+
+class QueryService(object):
+    """
+    Local HTTP service answering filtered ADPY, death and count queries from a resident dataset.
+    The data is loaded once; when the converters publish new files the dataset is loaded again in the
+    background and replaces the old one in a single step, running requests keep the snapshot they started with.
+
+    It takes the address and the check interval of the files as arguments: QueryService(host, port, interval)
+    """
+    name = "QueryService"
+    log = None
+
+    @LogProgress()
+    def __init__(self, host="127.0.0.1", port=8765, interval=5.0):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.snapshot = None
+        self.pending = None  # Zuletzt beobachtete, noch nicht geladene Signatur
+        self.stopped = threading.Event()
+        self.reload_lock = threading.Lock()  # Neuladen über POST und durch die Überwachung nacheinander
+
+    # Laden des Datensatzes in einen neuen Snapshot
+    @LogProgress()
+    def load(self):
+        with self.reload_lock:
+            signature = file_signature()
+
+            evaluation = Evaluation(batch=True)
+            if all(os.path.exists(path.value) for path in STORE_FILES):
+                evaluation.load_stores()
+            else:
+                evaluation.load_registers()
+                evaluation.load_population()
+            evaluation.event_table = evaluation.build_event_table()
+
+            self.snapshot = Snapshot(evaluation, signature)
+            self.log(f"{len(self.snapshot.table)} Ereignisse geladen")
+
+    # Neuladen, sobald sich die Dateien geändert haben und seit der letzten Prüfung unverändert sind
+    def reload_if_changed(self):
+        signature = file_signature()
+        if signature == self.snapshot.signature:
+            self.pending = None
+            return False
+
+        if signature != self.pending:
+            self.pending = signature
+            return False
+
+        try:
+            self.load()
+        except Exception as error:
+            self.log(f"Neuladen fehlgeschlagen, der bisherige Datensatz bleibt aktiv: {error_message(error)}",
+                     log_type="ERROR")
+            return False
+
+        self.pending = None
+        return True
+
+    def watch(self):
+        while not self.stopped.wait(self.interval):
+            # Der Beobachter endet bei keinem Fehler, z. B. beim Lesen der Dateisignatur
+            try:
+                self.reload_if_changed()
+            except Exception as error:
+                self.log(f"Prüfen der Dateien fehlgeschlagen: {error_message(error)}", log_type="ERROR")
+
+    def status(self):
+        snapshot = self.snapshot
+        return {
+            "events": len(snapshot.table),
+            "types": snapshot.table.type_names,
+            "fields": ["type"] + list(CATEGORICAL_FIELDS),
+            "loaded": snapshot.loaded
+        }
+
+    def serve_forever(self):
+        if self.snapshot is None:
+            self.load()
+
+        watcher = threading.Thread(target=self.watch, daemon=True)
+        watcher.start()
+
+        server = ThreadingHTTPServer((self.host, self.port), make_handler(self))
+        self.log(f"Anfragen unter http://{self.host}:{server.server_address[1]}/query")
+        try:
+            server.serve_forever()
+        finally:
+            self.stopped.set()
+            server.server_close()
+
+
+def parse_query(parameters):
+    """
+    Converts the parameters of a query URL, e.g. /query?types=Flood,Storm&from=1980&to=2000&continent=Asia
+    :param parameters: Dict of parse_qs
+    :return: Tuple of (types, years, filters) as expected by Snapshot.query
+    """
+    def values(name):
+        return [value for entry in parameters.get(name, []) for value in entry.split(',') if value != '']
+
+    types = values("types") or None
+    years = None
+    if "from" in parameters or "to" in parameters:
+        years = (
+            int(parameters.get("from", [FIRST_YEAR])[0]),
+            int(parameters.get("to", [FIRST_YEAR + YEAR_COUNT - 1])[0])
+        )
+    filters = {field: values(field) for field in CATEGORICAL_FIELDS if values(field)}
+
+    return types, years, filters
+
+
+def error_message(error):
+    """
+    :param error: Caught exception
+    :return: Message of the exception, KeyError is not quoted as by str
+    """
+    if isinstance(error, KeyError) and len(error.args) == 1:
+        return str(error.args[0])
+
+    return str(error)
+
+
+def make_handler(service):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+
+            try:
+                if url.path == "/query":
+                    # Jede Anfrage arbeitet vollständig mit dem beim Eingang aktiven Snapshot
+                    body = service.snapshot.query(*parse_query(parse_qs(url.query)))
+                elif url.path == "/status":
+                    body = service.status()
+                else:
+                    return self.send_json(404, {"error": f"Unknown path {url.path}"})
+            except (KeyError, ValueError) as error:
+                return self.send_json(400, {"error": error_message(error)})
+
+            self.send_json(200, body)
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/reload":
+                return self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+            try:
+                service.load()
+            except Exception as error:
+                service.log(f"Neuladen fehlgeschlagen, der bisherige Datensatz bleibt aktiv: {error_message(error)}",
+                            log_type="ERROR")
+                return self.send_json(500, {"error": error_message(error)})
+
+            self.send_json(200, service.status())
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, text, *args):
+            basic_log(text, log_location="QueryHandler", args=args)
+
+    return QueryHandler
+
+
+# Bereitstellen der Auswertung für Abfragen
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lokaler Dienst für Abfragen der Auswertung")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse des Dienstes")
+    parser.add_argument("--port", type=int, default=8765, help="Port des Dienstes")
+    parser.add_argument("--interval", type=float, default=5.0, help="Sekunden zwischen zwei Prüfungen auf neue Daten")
+    parser.add_argument("--quiet", action="store_true", help="Nur Sicherheitsmeldungen und Fehler ausgeben")
+    parser.add_argument("--json-log", action="store_true", help="Ausgabe als eine JSON-Zeile je Meldung")
+    arguments = parser.parse_args()
+
+    LOG_BACKEND.configure(json_lines=arguments.json_log, quiet=arguments.quiet)
+
+    QueryService(arguments.host, arguments.port, arguments.interval).serve_forever()
@@ -0,0 +1,345 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils import FIRST_YEAR, YEAR_COUNT
+from engine import EventTable, CATEGORICAL_FIELDS
+
+
+# Kategorische Spalten der Ereignisse, die als Wörterbuch kodiert werden
+CATEGORICAL_COLUMNS = ("type",) + CATEGORICAL_FIELDS
+
+
+def encode(values):
+    """
+    Dictionary-encodes a column of strings in the order of first appearance
+    :param values: Iterable of strings
+    :return: Tuple of (categories, codes) as NumPy arrays
+    """
+    categories = {}
+    codes = [categories.setdefault(value, len(categories)) for value in values]
+
+    return np.array(list(categories), dtype=str), np.array(codes, dtype=np.int32)
+
+
+# Anzahl der veröffentlichten Versionen eines Ordners, die für noch laufende Leser erhalten bleiben
+KEEP_VERSIONS = 2
+
+
+def write_json_files(folder, files, workers=None, default=None):
+    """
+    Publishes JSON files in a folder as one unit, see publish_files
+    :param folder: Target folder
+    :param files: Dict of file name -> JSON-serializable data
+    :param workers: Number of threads, chosen by ThreadPoolExecutor if None
+    :param default: Function converting objects json cannot serialize, e.g. DisasterEvent.as_dict
+    :return: nothing
+    """
+    publish_files(folder, json_writers(files, default), workers)
+
+
+def json_writers(files, default=None):
+    """
+    :param files: Dict of file name -> JSON-serializable data
+    :param default: Function converting objects json cannot serialize, e.g. DisasterEvent.as_dict
+    :return: Dict of file name -> writer for publish_files
+    """
+    def writer(data):
+        def write(path):
+            with open(path, 'w+') as file:
+                json.dump(data, file, default=default)
+
+        return write
+
+    return {name: writer(data) for name, data in files.items()}
+
+
+def publish_files(folder, writers, workers=None):
+    """
+    Publishes files in a folder as one unit. The folder is a symbolic link to a version directory in
+    ".<folder>.versions" next to it. A new version is written completely by a thread pool, files of the current
+    version that are not rewritten are taken over and the link is then replaced in a single os.replace.
+    Readers that resolve the link once with current_version read all files of one load from the same version.
+    The last KEEP_VERSIONS versions are kept, so a reader that resolved the link has to finish before
+    KEEP_VERSIONS further versions of the folder are published. Callers therefore publish all files of one
+    run together instead of one publication per file group.
+    A folder that is still a plain directory is moved into the versions once; only during this first
+    publication the folder is briefly missing.
+    :param folder: Target folder
+    :param writers: Dict of file name -> function writing the file to the given path
+    :param workers: Number of threads, chosen by ThreadPoolExecutor if None
+    :return: nothing
+    """
+    folder = os.path.normpath(folder)
+    parent, base = os.path.dirname(folder) or ".", os.path.basename(folder)
+    versions = os.path.join(parent, f".{base}.versions")
+    os.makedirs(versions, exist_ok=True)
+
+    # Versionen werden nach ihrem Erstellungszeitpunkt benannt und geordnet
+    version = tempfile.mkdtemp(prefix=f"{time.time_ns():020d}.", dir=versions)
+
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(lambda item: item[1](os.path.join(version, item[0])), writers.items()))
+
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name not in writers:
+                    take_over(os.path.join(folder, name), os.path.join(version, name))
+
+        os.chmod(version, 0o755)
+        if os.path.isdir(folder) and not os.path.islink(folder):
+            os.rename(folder, os.path.join(versions, f"{0:020d}.{time.time_ns()}.migrated"))
+
+        link = os.path.join(parent, f".{base}.link.{os.getpid()}")
+        os.symlink(os.path.relpath(version, parent), link)
+        os.replace(link, folder)
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+
+    remove_old_versions(versions, version)
+
+
+def current_version(folder):
+    """
+    :param folder: Published folder
+    :return: Path of the version directory the folder points to at this moment, or the folder itself
+    """
+    return os.path.realpath(folder)
+
+
+def remove_old_versions(versions, current):
+    names = sorted(os.listdir(versions))
+    for name in names[:-KEEP_VERSIONS]:
+        path = os.path.join(versions, name)
+        if os.path.realpath(path) != os.path.realpath(current):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def take_over(source, target):
+    # Dateien werden nach Möglichkeit nur verlinkt statt kopiert
+    if os.path.isdir(source):
+        shutil.copytree(source, target, copy_function=link_or_copy)
+    else:
+        link_or_copy(source, target)
+
+
+def link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def write_disaster_store(path, converted_data):
+    """
+    Writes disaster data nested as {type: {year: {ident: event}}} as packed columns into a .npz file,
+    published as a new version of its folder, see publish_files
+    :param path: Target file
+    :param converted_data: converted_data of DisasterDataConverter
+    :return: nothing
+    """
+    publish_files(os.path.dirname(path) or ".", disaster_store_writers(path, converted_data))
+
+
+def disaster_store_writers(path, converted_data):
+    """
+    :param path: Target file of the disaster store
+    :param converted_data: converted_data of DisasterDataConverter
+    :return: Dict of file name -> writer for publish_files
+    """
+    idents, years, deaths = [], [], []
+    categorical = {column: [] for column in CATEGORICAL_COLUMNS}
+
+    for d_type in converted_data:
+        for year, events in converted_data[d_type].items():
+            for ident, event in events.items():
+                idents.append(ident)
+                years.append(int(year))
+                deaths.append(event["deaths"])
+                for column in CATEGORICAL_COLUMNS:
+                    categorical[column].append(event[column])
+
+    columns = {
+        "ident": np.array(idents, dtype=str),
+        "year": np.array(years, dtype=np.int32),
+        "deaths": np.array(deaths, dtype=np.int32)
+    }
+    for column in CATEGORICAL_COLUMNS:
+        columns[f"{column}_names"], columns[column] = encode(categorical[column])
+
+    def write(target):
+        with open(target, 'wb') as file:
+            np.savez(file, **columns)
+
+    # Veröffentlichen als neue Version des Ordners, geöffnete Abbildungen der alten Datei bleiben gültig
+    return {os.path.basename(path): write}
+
+
+def write_population_matrix(counts_path, densities_path, index_path, converted_data):
+    """
+    Writes population data nested as {country: {year: {"count", "density"}}} as memory-mappable
+    float64 (country x year) matrices in .npy format plus a JSON index of the row names.
+    The three files are published together as a new version of their folder, see publish_files
+    :param counts_path: Target file of the population counts
+    :param densities_path: Target file of the population densities
+    :param index_path: Target file of the row names
+    :param converted_data: converted_data of PopulationDataConverter
+    :return: nothing
+    """
+    publish_files(os.path.dirname(counts_path) or ".",
+                  population_matrix_writers(counts_path, densities_path, index_path, converted_data))
+
+
+def population_matrix_writers(counts_path, densities_path, index_path, converted_data):
+    """
+    :param counts_path: Target file of the population counts
+    :param densities_path: Target file of the population densities
+    :param index_path: Target file of the row names
+    :param converted_data: converted_data of PopulationDataConverter
+    :return: Dict of file name -> writer for publish_files
+    """
+    folder = os.path.dirname(counts_path) or "."
+    if any((os.path.dirname(path) or ".") != folder for path in (densities_path, index_path)):
+        raise ValueError("The population matrices and their index have to be published in the same folder")
+
+    names = list(converted_data)
+    shape = (len(names), YEAR_COUNT)
+
+    def matrix(key):
+        def write(target):
+            values = np.lib.format.open_memmap(target, mode='w+', dtype=np.float64, shape=shape)
+            for row, country in enumerate(names):
+                for year in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT):
+                    values[row, year - FIRST_YEAR] = converted_data[country][str(year)][key]
+            values.flush()
+
+        return write
+
+    def index(target):
+        with open(target, 'w+') as file:
+            json.dump(names, file)
+
+    # Matrizen und Index werden als eine Version veröffentlicht, geöffnete Abbildungen der alten bleiben gültig
+    return {
+        os.path.basename(counts_path): matrix("count"),
+        os.path.basename(densities_path): matrix("density"),
+        os.path.basename(index_path): index
+    }
+
+
+def open_population_matrix(path):
+    """
+    Maps a matrix written by write_population_matrix read-only into memory.
+    All processes opening the same file share one copy in the page cache.
+    :param path: Path of the .npy file
+    :return: Read-only np.memmap of shape (country x year)
+    """
+    return np.load(path, mmap_mode='r')
+
+
+def write_evaluation_state(path, type_names, fingerprints, adpys, numbers, deaths):
+    """
+    Saves the results of an evaluation together with the fingerprints of its partitions
+    :param path: Target file
+    :param type_names: Disaster types in the order of the rows
+    :param fingerprints: Fingerprints of the (type x year) partitions
+    :param adpys: ADPY values (type x year) without normalization
+    :param numbers: Number of events (type x year)
+    :param deaths: Deaths (type x year)
+    :return: nothing
+    """
+    with open(path, 'wb') as file:
+        np.savez(
+            file, type_names=np.array(type_names, dtype=str), fingerprints=fingerprints,
+            adpys=adpys, numbers=numbers, deaths=deaths
+        )
+
+
+def read_evaluation_state(path):
+    """
+    :param path: File written by write_evaluation_state
+    :return: Dict with the arrays type_names, fingerprints, adpys, numbers and deaths
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+class DisasterStore(object):
+    """
+    Packed columnar store of all disaster events.
+    Categorical columns are kept as int32 codes with an additional array of names per column.
+    A column is only read from the file when it is first used. The file stays open, so later reads come from the
+    version that was opened even if a newer one is published meanwhile.
+
+    It takes the path of the .npz file as argument: DisasterStore(path)
+    """
+
+    def __init__(self, path):
+        self.data = np.load(path, allow_pickle=False)
+        self.columns = {}
+
+    def column(self, key):
+        """
+        :param key: Name of a column, e.g. "year" or "country_names"
+        :return: Array of the column
+        """
+        if key not in self.columns:
+            self.columns[key] = self.data[key]
+
+        return self.columns[key]
+
+    def names(self, column):
+        """
+        :param column: Categorical column, e.g. "type" or "country"
+        :return: List of the names of the column in the order of their codes
+        """
+        return self.column(f"{column}_names").tolist()
+
+    def country_isos(self):
+        """
+        :return: List of the distinct (country, iso) pairs of all events
+        """
+        pairs = np.unique(np.stack([self.column("country"), self.column("iso")], axis=1), axis=0)
+        countries, isos = self.names("country"), self.names("iso")
+
+        return [(countries[country], isos[iso]) for country, iso in pairs]
+
+    def to_event_table(self, population_index, type_names=None):
+        """
+        Builds the EventTable of the evaluation without going through per-event dicts
+        :param population_index: PopulationIndex used to resolve the countries
+        :param type_names: Order of the disaster types, order of the store if None
+        :return: EventTable with all events between 1920 and 2020
+        """
+        stored_types = self.names("type")
+        type_names = stored_types if type_names is None else list(type_names)
+
+        # Umkodieren der Typen in die gewünschte Reihenfolge, nicht gewünschte Typen erhalten -1
+        type_map = np.array([type_names.index(t) if t in type_names else -1 for t in stored_types], dtype=np.int64)
+
+        # Auflösen jedes Landes nur einmal
+        country_rows = []
+        for country in self.names("country"):
+            row = population_index.resolve(country)
+            country_rows.append(-1 if row is None else row)
+        country_rows = np.array(country_rows, dtype=np.int64)
+
+        types = type_map[self.column("type")]
+        years = self.column("year").astype(np.int64) - FIRST_YEAR
+        rows = country_rows[self.column("country")]
+
+        selected = (types >= 0) & (years >= 0) & (years < YEAR_COUNT)
+        if np.any(rows[selected] < 0):
+            missing = self.column("country_names")[np.unique(self.column("country")[selected & (rows < 0)])]
+            raise KeyError(f"No population data for {', '.join(missing)}")
+
+        categories = {field: (self.names(field), self.column(field)[selected]) for field in CATEGORICAL_FIELDS}
+
+        return EventTable(
+            type_names, types[selected], years[selected], self.column("deaths")[selected], rows[selected], categories
+        )
@@ -1,6 +1,18 @@
 from enum import Enum
+import atexit
+import collections
 import csv
+import functools
+import json
+import logging
 import os
+import queue
+import sys
+import time
+try:
+    import resource
+except ImportError:
+    resource = None
 
 
 # Konstanten
@@ -10,42 +22,274 @@ class PyCharmConstants(Enum):
     POPULATION_COUNTRIES_REGISTER_PATH = "./../resources/population_development_of_each_country/countries.json"
     DISASTER_COUNTRIES_REGISTER_PATH = "./../resources/development_of_disaster_for_each_disaster/countries.json"
     DISASTER_TYPE_REGISTER_PATH = "./../resources/development_of_disaster_for_each_disaster/disasters.json"
+    POPULATION_MATRIX_PATH = "./../resources/population_development_of_each_country/population_counts.npy"
+    POPULATION_DENSITY_MATRIX_PATH = "./../resources/population_development_of_each_country/population_densities.npy"
+    POPULATION_MATRIX_INDEX_PATH = "./../resources/population_development_of_each_country/population_index.json"
+    DISASTER_STORE_PATH = "./../resources/development_of_disaster_for_each_disaster/disasters.npz"
+    COUNTRY_RESOLUTION_PATH = "./../resources/development_of_disaster_for_each_disaster/country_resolution.json"
+    EVALUATION_STATE_PATH = "./../resources/evaluation_results/state.npz"
+    REGION_INDEX_PATH = "./../resources/evaluation_results/regions.npz"
+    REGION_MEMBERSHIP_PATH = "./../resources/region_membership.json"
 
     POPULATION_FOLDER_PATH = "./../resources/population_development_of_each_country"
     POPULATION_CHARTS_FOLDER_PATH = "./../resources/population_charts"
     DEVELOPMENT_OF_DISASTERS_FOLDER_PATH = "./../resources/development_of_disaster_for_each_disaster"
     EVALUATION_FOLDER_PATH = "./../resources/evaluation_results"
+    STAGE_CACHE_FOLDER_PATH = "./../resources/stage_cache"
+
+
+# Betrachteter Zeitraum von 1920 bis 2020
+FIRST_YEAR = 1920
+YEAR_COUNT = 101
+
+
+# Protokollierung
+PROGRESS = logging.INFO + 5
+SECURITY = logging.WARNING + 5
+LOG_LEVELS = {"INFO": logging.INFO, "PROGRESS": PROGRESS, "SECURITY": SECURITY, "ERROR": logging.ERROR}
+logging.addLevelName(PROGRESS, "PROGRESS")
+logging.addLevelName(SECURITY, "SECURITY")
+
+LOGGER = logging.getLogger("disasters")
+LOGGER.propagate = False
+LOGGER.setLevel(logging.INFO)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Formats records as "[TYPE]: text" or "[TYPE] -> location: text".
+    """
+
+    def format(self, record):
+        location = getattr(record, "location", None)
+        if location is None:
+            return "[{}]: {}".format(record.levelname, record.getMessage())
+
+        return "[{}] -> {}: {}".format(record.levelname, location, record.getMessage())
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line with time, type, location and text.
+    """
+
+    def format(self, record):
+        return json.dumps({
+            "time": record.created,
+            "type": record.levelname,
+            "location": getattr(record, "location", None),
+            "text": record.getMessage()
+        }, ensure_ascii=False)
+
+
+class RecordQueueHandler(logging.Handler):
+    """
+    Puts the records unformatted into a queue, unlike logging.handlers.QueueHandler the text of a record is
+    only built in the thread that writes it.
+    """
+
+    def __init__(self, records):
+        super().__init__()
+        self.records = records
+
+    def emit(self, record):
+        self.records.put_nowait(record)
+
+
+class LogBackend(object):
+    """
+    Writes the log records of LOGGER in a background thread, the logging stages only put them into a queue.
+    """
+
+    def __init__(self):
+        self.listener = None
+        self.json_lines = False
+        self.quiet = False
+        self.stream = None
+
+    def handler(self):
+        handler = logging.StreamHandler(sys.stdout if self.stream is None else self.stream)
+        handler.setFormatter(JsonFormatter() if self.json_lines else TextFormatter())
+
+        return handler
+
+    def configure(self, json_lines=False, quiet=False, stream=None):
+        """
+        (Re)configures the output of the log
+        :param json_lines: Writes one JSON object per record instead of the text format
+        :param quiet: Writes only SECURITY and ERROR records
+        :param stream: Target stream, sys.stdout if None
+        :return: nothing
+        """
+        import logging.handlers
+
+        self.stop()
+        self.json_lines, self.quiet, self.stream = json_lines, quiet, stream
+
+        records = queue.SimpleQueue()
+        LOGGER.handlers = [RecordQueueHandler(records)]
+        LOGGER.setLevel(SECURITY if quiet else logging.INFO)
+
+        self.listener = logging.handlers.QueueListener(records, self.handler())
+        self.listener.start()
+
+    def configure_worker(self):
+        """
+        Lets a worker process write its records directly with the settings of the parent process.
+        A forked worker inherits the queue of the parent, but not the thread that writes it.
+        :return: nothing
+        """
+        self.listener = None
+        LOGGER.handlers = [self.handler()]
+        LOGGER.setLevel(SECURITY if self.quiet else logging.INFO)
+
+    def stop(self):
+        """
+        Writes all queued records and stops the background thread
+        :return: nothing
+        """
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            LOGGER.handlers = []
+
+
+LOG_BACKEND = LogBackend()
+atexit.register(LOG_BACKEND.stop)
+
+
+# Messwerte der Schritte
+class RunMetrics(object):
+    """
+    Collects wall time, CPU time, growth of the peak memory and item counts of every stage decorated with
+    LogProgress in this process. One stage can additionally be profiled with cProfile.
+    Only the last max_records calls are kept, the totals per stage cover all calls.
+    """
+
+    def __init__(self, max_records=10000):
+        self.stages = collections.deque(maxlen=max_records)
+        self.totals = {}
+        self.profile_stage = None
+        self.profile_path = None
+
+    def reset(self):
+        self.stages.clear()
+        self.totals = {}
+
+    def enable_profiling(self, stage, path=None):
+        """
+        Profiles every call of one stage with cProfile
+        :param stage: Name of the stage as "Class.function", e.g. "PopulationDataConverter.convert_data"
+        :param path: File for the collected statistics (pstats format), printed if None
+        :return: nothing
+        """
+        self.profile_stage = stage
+        self.profile_path = path
+
+    def record(self, stage, wall, cpu, peak_memory_delta, items):
+        self.stages.append({
+            "stage": stage,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_rss_delta_mb": peak_memory_delta,
+            "items": items
+        })
+
+        total = self.totals.setdefault(stage, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+        total["calls"] += 1
+        total["wall_s"] += wall
+        total["cpu_s"] += cpu
+
+    def report(self):
+        """
+        :return: Dict with the measurements of the last calls and the totals per stage
+        """
+        return {"stages": list(self.stages), "totals": self.totals, "peak_rss_mb": peak_memory()}
+
+    def write_report(self, path):
+        """
+        Saves the report as JSON
+        :param path: Target file
+        :return: nothing
+        """
+        with open(path, 'w+') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+METRICS = RunMetrics()
 
 
 # Dekoratoren
 class LogProgress(object):
     """
     Includes function in PROGRESS logging and creates a function specific log lambda,
-    which can be called in the function.
+    which can be called in the function. Every call is measured and recorded in METRICS.
 
-    It accepts no arguments.
+    It optionally takes the name of the attribute recorded as item count, a number or a sized container:
+    LogProgress(items)
     """
 
-    def __init__(self):
-        self.loc = ""
+    def __init__(self, items=None):
+        self.items = items
 
     def __call__(self, f):
-        def wrapped_f(wrapped_self, *args):
-            self.generate_location(f, wrapped_self)
-            self.generate_class_log(wrapped_self)
-
-            self.generate_class_log(wrapped_self)
-            basic_log(f"Starting {self.loc}", log_type="PROGRESS")
-            f(wrapped_self, *args)
-            basic_log(f"Finishing {self.loc}", log_type="PROGRESS")
+        @functools.wraps(f)
+        def wrapped_f(wrapped_self, *args, **kwargs):
+            location = f"{f.__name__} in {wrapped_self.name}"
+            stage = f"{wrapped_self.name}.{f.__name__}"
+            self.generate_class_log(wrapped_self, location)
+
+            basic_log(f"Starting {location}", log_type="PROGRESS")
+            peak_before = peak_memory()
+            started = time.perf_counter()
+            started_cpu = time.process_time()
+
+            if METRICS.profile_stage == stage:
+                result = self.profile(f, wrapped_self, *args, **kwargs)
+            else:
+                result = f(wrapped_self, *args, **kwargs)
+
+            METRICS.record(
+                stage, time.perf_counter() - started, time.process_time() - started_cpu,
+                peak_memory() - peak_before, self.count_items(wrapped_self)
+            )
+            # Aufgerufene Schritte ersetzen die Funktion log, daher wird sie für die Ausgabe wiederhergestellt
+            self.generate_class_log(wrapped_self, location)
+            basic_log(f"Finishing {location}", log_type="PROGRESS")
+
+            return result
 
         return wrapped_f
 
-    def generate_location(self, f, wrapped_self):
-        self.loc = f"{f.__name__} in {wrapped_self.name}"
+    @staticmethod
+    def generate_class_log(wrapped_self, location):
+        wrapped_self.log = lambda text, *args, log_type="INFO": basic_log(text, log_type, location, args)
+
+    @staticmethod
+    def profile(f, wrapped_self, *args, **kwargs):
+        # Die Profiler werden nur für den untersuchten Schritt geladen
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        result = profiler.runcall(f, wrapped_self, *args, **kwargs)
+
+        if METRICS.profile_path is None:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+        else:
+            profiler.dump_stats(METRICS.profile_path)
+
+        return result
+
+    def count_items(self, wrapped_self):
+        if self.items is None:
+            return None
+
+        value = getattr(wrapped_self, self.items, None)
+        if value is None or isinstance(value, int):
+            return value
 
-    def generate_class_log(self, wrapped_self):
-        wrapped_self.log = lambda text, log_type="INFO": basic_log(text, log_type, log_location=self.loc)
+        return len(value)
 
 
 class Secure(object):
@@ -60,31 +304,59 @@ class Secure(object):
         self.args = args
 
     def __call__(self, f):
-        def wrapped_f(wrapped_self, *args):
+        @functools.wraps(f)
+        def wrapped_f(wrapped_self, *args, **kwargs):
             for arg in self.args:
                 if not (hasattr(wrapped_self, arg) and getattr(wrapped_self, arg) is not None and bool(getattr(wrapped_self, arg))):
                     wrapped_self.log(f"Canceled {f.__name__} due to missing property {arg}", log_type="SECURITY")
                     return
 
-            f(wrapped_self, *args)
+            return f(wrapped_self, *args, **kwargs)
 
         return wrapped_f
 
 
 # Funktionen
-def basic_log(text, log_type="INFO", log_location=None):
+def basic_log(text, log_type="INFO", log_location=None, args=()):
     """
     Function for standardized logging
-    :param text: String to log
+    :param text: String to log, may contain %-placeholders for args
     :param log_type: Type
     :param log_location: Location of caller
+    :param args: Values of the placeholders, only formatted if the type is written
     :return: nothing
     """
+    level = LOG_LEVELS.get(log_type, logging.INFO)
 
-    if log_location is None:
-        print("[{}]: {}".format(log_type, text))
-    else:
-        print("[{}] -> {}: {}".format(log_type, log_location, text))
+    # Abgeschaltete Typen kosten nur diese Abfrage
+    if not LOGGER.isEnabledFor(level):
+        return
+
+    if LOG_BACKEND.listener is None and not LOGGER.handlers:
+        LOG_BACKEND.configure()
+
+    LOGGER.log(level, text, *args, extra={"location": log_location})
+
+
+def peak_memory():
+    """
+    :return: Peak resident memory of this process in MB, 0 if it cannot be determined on this platform
+    """
+    if resource is None:
+        return 0.0
+
+    # Linux gibt den Wert in Kilobyte an, macOS in Byte
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def country_file_name(country):
+    """
+    Converts a country name into the name of its JSON file (without extension)
+    :param country: Country name as given in the population data
+    :return: File name as written by PopulationDataConverter.write_data
+    """
+    return str(country).replace('/', '_').replace(':', ' ').lower()
 
 
 def check_dir(path):
@@ -125,7 +397,7 @@ class CSVReader(object):
             self.log("Datei nicht gefunden", log_type="ERROR")
 
     @Secure("file")
-    @LogProgress()
+    @LogProgress("data")
     def get_data_from_file(self):
         self.csv_file = csv.reader(self.file, delimiter=self.delimiter)
 
@@ -138,4 +410,25 @@ class CSVReader(object):
             self.data.append(row_list)
 
         self.log("Alle Daten aus der Datei ausgelesen")
-        self.file.close()
\ No newline at end of file
+        self.file.close()
+
+    def close_file(self):
+        """
+        Closes the file without reading it, e.g. if the data is taken from elsewhere
+        :return: nothing
+        """
+        if getattr(self, "file", None) is not None:
+            self.file.close()
+
+    def stream_data_from_file(self, columns=None):
+        """
+        Reads the file row by row without keeping the rows in the attribute data.
+        The file is closed once the generator is exhausted.
+        :param columns: Indices of the columns to yield, all columns if None
+        :return: Generator of rows as tuples of strings
+        """
+        try:
+            for row in csv.reader(self.file, delimiter=self.delimiter):
+                yield tuple(row) if columns is None else tuple(row[column] for column in columns)
+        finally:
+            self.file.close()
\ No newline at end of file
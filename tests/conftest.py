@@ -0,0 +1,48 @@
+import os
+import sys
+import pytest
+
+# Die Module liegen flach im Ordner code und importieren sich gegenseitig über ihren Namen
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code"))
+
+from utils import FIRST_YEAR, YEAR_COUNT  # noqa: E402
+from lookup import PopulationIndex  # noqa: E402
+
+
+def event(country, deaths, continent="Africa", iso=""):
+    """
+    :return: Event as written by DisasterDataConverter
+    """
+    return {
+        "country": country, "deaths": deaths, "continent": continent, "iso": iso or country[:3].upper(),
+        "group": "Natural", "subgroup": "Hydrological", "subtype": "", "entry": "Kill"
+    }
+
+
+@pytest.fixture
+def population_index():
+    countries = {"Niger": 3000000, "Nigeria": 40000000, "Germany": 60000000, "Western Africa": 90000000}
+    converted_data = {
+        country: {
+            str(year): {"count": count + 1000 * (year - FIRST_YEAR), "density": 1}
+            for year in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT)
+        }
+        for country, count in countries.items()
+    }
+
+    return PopulationIndex.from_converted_data(converted_data)
+
+
+@pytest.fixture
+def disasters():
+    return {
+        "Flood": {
+            "1919": {"x": event("Niger", 99)},
+            "1920": {"a": event("Niger", 10), "b": event("Nigeria", 250)},
+            "1990": {"c": event("Germany", 3, "Europe")}
+        },
+        "Storm": {
+            "1920": {"d": event("Nigeria", 0)},
+            "2020": {"e": event("Niger", 7), "f": event("Niger", 1), "g": event("Germany", 40, "Europe")}
+        }
+    }
@@ -0,0 +1,55 @@
+import os
+import pipeline
+from cache import StageCache
+from resolver import CountryResolver
+
+
+def test_keys_change_with_input_files_code_and_parameters(tmp_path):
+    path = tmp_path / "input.csv"
+    path.write_text("a;b\n")
+    cache = StageCache(str(tmp_path / "cache"))
+    key = cache.key("stage", files=[str(path)], code="1", parameters={"first_year": 1920})
+
+    assert cache.key("stage", files=[str(path)], code="1", parameters={"first_year": 1920}) == key
+    assert cache.key("stage", files=[str(path)], code="2", parameters={"first_year": 1920}) != key
+    assert cache.key("stage", files=[str(path)], code="1", parameters={"first_year": 1921}) != key
+    assert cache.key("stage", files=[str(path)], upstream=["x"], code="1", parameters={"first_year": 1920}) != key
+
+    path.write_text("a;c\n")
+    assert cache.key("stage", files=[str(path)], code="1", parameters={"first_year": 1920}) != key
+
+
+def test_resolution_tables_depend_on_the_aggregate_detection_and_the_period(monkeypatch):
+    population_countries = ["Niger", "Africa"]
+    fingerprint = CountryResolver(population_countries).fingerprint()
+
+    monkeypatch.setattr("resolver.GEOGRAPHIC_REGIONS", {"africa", "atlantis"})
+    changed_regions = CountryResolver(population_countries).fingerprint()
+    monkeypatch.undo()
+    monkeypatch.setattr("resolver.YEAR_COUNT", 102)
+    changed_period = CountryResolver(population_countries).fingerprint()
+
+    assert len({fingerprint, changed_regions, changed_period}) == 3
+    assert pipeline.PERIOD == {"first_year": 1920, "year_count": 101}
+
+
+def test_evict_removes_the_least_recently_used_outputs(tmp_path):
+    cache = StageCache(str(tmp_path), max_bytes=1 << 20)
+    for ind, key in enumerate(["old", "used", "new"]):
+        cache.put(key, b"x" * 1000)
+        os.utime(cache.path(key), (1000 + ind, 1000 + ind))
+    assert cache.get("used") == b"x" * 1000
+
+    cache.max_bytes = 2500
+    cache.evict()
+
+    assert sorted(os.listdir(str(tmp_path))) == ["new.pickle", "used.pickle"]
+
+
+def test_unreadable_outputs_are_removed(tmp_path):
+    cache = StageCache(str(tmp_path))
+    with open(cache.path("broken"), 'wb') as file:
+        file.write(b"\x80\x05not a pickle")
+
+    assert cache.get("broken") is None
+    assert not os.path.exists(cache.path("broken"))
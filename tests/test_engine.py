@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from utils import FIRST_YEAR, YEAR_COUNT
+from engine import EventTable, aggregate, aggregate_parallel
+
+
+def baseline(disasters, population_index):
+    """
+    Formel 2 as computed by the original per-event loop of Evaluation.generate_adpy_values
+    """
+    results = {}
+    for d_type, data in disasters.items():
+        adpys, numbers, deaths = np.zeros(YEAR_COUNT), np.zeros(YEAR_COUNT), np.zeros(YEAR_COUNT)
+        for year in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT):
+            events = data.get(str(year), {})
+            if not events:
+                continue
+
+            adpys[year - FIRST_YEAR] = np.sum([
+                float(event["deaths"]) / population_index.get(event["country"], year) / len(events)
+                for event in events.values()
+            ])
+            deaths[year - FIRST_YEAR] = np.sum([float(event["deaths"]) for event in events.values()])
+            numbers[year - FIRST_YEAR] = len(events)
+
+        results[d_type] = (adpys, numbers, deaths)
+
+    return results
+
+
+def test_aggregate_matches_baseline_formula(disasters, population_index):
+    table = EventTable.from_disasters(disasters, population_index)
+    adpys, numbers, deaths = aggregate(table, population_index.counts)
+
+    for ind, (d_type, (expected_adpys, expected_numbers, expected_deaths)) in enumerate(
+            baseline(disasters, population_index).items()):
+        assert table.type_names[ind] == d_type
+        np.testing.assert_allclose(adpys[ind], expected_adpys, rtol=1e-12, atol=0)
+        np.testing.assert_array_equal(numbers[ind], expected_numbers)
+        np.testing.assert_array_equal(deaths[ind], expected_deaths)
+
+
+def test_events_outside_the_period_are_skipped(disasters, population_index):
+    table = EventTable.from_disasters(disasters, population_index)
+
+    assert len(table) == 7
+    assert table.years.min() == 0 and table.years.max() == YEAR_COUNT - 1
+
+
+def test_select_keeps_the_values_of_the_selected_events(disasters, population_index):
+    table = EventTable.from_disasters(disasters, population_index)
+    adpys, numbers, deaths = aggregate(table.select(table.types == 0), population_index.counts)
+
+    expected_adpys, expected_numbers, expected_deaths = baseline(disasters, population_index)["Flood"]
+    np.testing.assert_allclose(adpys[0], expected_adpys, rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(numbers[0], expected_numbers)
+    np.testing.assert_array_equal(deaths[0], expected_deaths)
+    np.testing.assert_array_equal(numbers[1], np.zeros(YEAR_COUNT))
+
+
+@pytest.mark.parametrize("memory_mapped", [False, True])
+def test_parallel_aggregation_matches_aggregate(tmp_path, disasters, population_index, memory_mapped):
+    table = EventTable.from_disasters(disasters, population_index)
+    counts = population_index.counts
+    if memory_mapped:
+        np.save(str(tmp_path / "counts.npy"), counts)
+        counts = np.load(str(tmp_path / "counts.npy"), mmap_mode='r')
+
+    for result, expected in zip(aggregate_parallel(table, counts, 2), aggregate(table, counts)):
+        np.testing.assert_array_equal(result, expected)
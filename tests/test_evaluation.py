@@ -0,0 +1,51 @@
+import os
+import numpy as np
+from conftest import event
+from engine import EventTable, aggregate
+from evaluation import Evaluation
+from store import read_evaluation_state
+
+
+def workspace(tmp_path, monkeypatch):
+    # Die Pfade der Konstanten sind relativ zum Ordner code
+    os.makedirs(tmp_path / "code")
+    os.makedirs(tmp_path / "resources")
+    monkeypatch.chdir(tmp_path / "code")
+
+
+def incremental(population_index, disasters):
+    evaluation = Evaluation(batch=True)
+    evaluation.population_index = population_index
+
+    return evaluation.update_adpy_values(EventTable.from_disasters(disasters, population_index))
+
+
+def assert_full_recompute(values, population_index, disasters):
+    expected = aggregate(EventTable.from_disasters(disasters, population_index), population_index.counts)
+    for result, full in zip(values, expected):
+        np.testing.assert_allclose(result, full, rtol=1e-12, atol=0)
+
+
+def test_incremental_run_after_a_change_equals_a_full_recompute(tmp_path, monkeypatch, disasters,
+                                                               population_index):
+    workspace(tmp_path, monkeypatch)
+    incremental(population_index, disasters)
+
+    disasters["Flood"]["1920"]["a"] = event("Niger", 20)
+    disasters["Storm"]["2020"]["h"] = event("Nigeria", 5)
+    del disasters["Storm"]["1920"]
+    assert_full_recompute(incremental(population_index, disasters), population_index, disasters)
+
+    population_index.counts[0, -1] += 1
+    assert_full_recompute(incremental(population_index, disasters), population_index, disasters)
+
+
+def test_runs_restricted_to_some_types_keep_the_state_of_the_others(tmp_path, monkeypatch, disasters,
+                                                                    population_index):
+    workspace(tmp_path, monkeypatch)
+    incremental(population_index, disasters)
+    incremental(population_index, {"Flood": disasters["Flood"]})
+
+    state = read_evaluation_state(str(tmp_path / "resources" / "evaluation_results" / "state.npz"))
+    assert state["type_names"].tolist() == ["Flood", "Storm"]
+    assert_full_recompute(incremental(population_index, disasters), population_index, disasters)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from population import PopulationDataConverter, backcast, parse_population_counts
+
+
+def yearly_loop(value, factor, start_year, base_year=1950, truncate=False):
+    """
+    Back-extrapolation year by year as in the original calculate_missing_population_numbers
+    """
+    values = []
+    for _ in range(start_year, base_year):
+        value = int(value / factor) if truncate else value / factor
+        values.append(value)
+
+    return values[::-1]
+
+
+def test_backcast_matches_yearly_division():
+    base = np.array([1000000.0, 52000.0, 731.0])
+    factors = np.array([1.02, 0.99, 1.5])
+
+    values = backcast(base, factors, 1920)
+
+    assert values.shape == (3, 30)
+    for row in range(3):
+        np.testing.assert_allclose(values[row], yearly_loop(base[row], factors[row], 1920), rtol=1e-12)
+
+
+def test_backcast_differs_from_truncating_loop_by_at_most_one_per_year():
+    base = np.array([1234567.0, 98765.0])
+    factors = np.array([1.013, 1.027])
+
+    values = np.trunc(backcast(base, factors, 1920))
+    years_before_base = np.arange(30, 0, -1)
+
+    # Jedes Abschneiden verliert weniger als eins, der Wert k Jahre vor 1950 weicht daher höchstens um k ab
+    for row in range(2):
+        truncated = np.array(yearly_loop(base[row], factors[row], 1920, truncate=True))
+        assert np.all(np.abs(values[row] - truncated) <= years_before_base)
+
+
+def test_backcast_keeps_values_for_undefined_factors():
+    values = backcast([500.0, 800.0], [np.nan, 0.0], 1940)
+
+    np.testing.assert_array_equal(values, [[500.0] * 10, [800.0] * 10])
+
+
+
+def old_parse(value):
+    """
+    Parsing of a count as in the original convert_data, correct for the three decimals of the WPP export
+    """
+    return int(str(value).replace('.', ''))
+
+
+@pytest.mark.parametrize("value", ["12", "12.3", "0.05", "1234.567"])
+def test_parsed_counts_match_the_original_parsing_of_three_decimals(value):
+    padded = f"{float(value):.3f}"
+
+    assert parse_population_counts([value]).tolist() == [old_parse(padded)]
+    assert parse_population_counts([padded]).tolist() == [old_parse(padded)]
+
+
+def test_rows_after_2020_are_dropped_before_parsing():
+    def row(country, year, count, density):
+        return ["1", country, "2", "Medium", year, f"{year}.5", "", "", count, density]
+
+    converter = PopulationDataConverter()
+    converter.data = [row("Niger", "2019", "23310.719", "18.4"), row("Niger", "2020", "24206.636", "19.1"),
+                      row("Niger", "2021", "not parsed", ""), row("Oman", "2050", "", "")]
+    converter.convert_data()
+
+    assert converter.converted_data == {
+        "Niger": {"2019": {"count": 23310719, "density": 18.4}, "2020": {"count": 24206636, "density": 19.1}}
+    }
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from engine import EventTable, aggregate
+from regions import RegionIndex, is_aggregate
+
+
+@pytest.mark.parametrize("name", [
+    "World", "Western Africa", "European Union (EU: 28)", "WHO: European Region (EURO)", "Europe (48)",
+    "Low-income countries", "France (and dependencies)", "Southern Common Market (MERCOSUR)", "BRICS"
+])
+def test_regions_and_groups_are_aggregates(name):
+    assert is_aggregate(name)
+
+
+@pytest.mark.parametrize("name", [
+    "Niger", "Dominican Republic", "Micronesia (Fed. States of)", "United Republic of Tanzania", "Réunion",
+    "China, Hong Kong SAR", "Saint Martin (French part)"
+])
+def test_countries_are_not_aggregates(name):
+    assert not is_aggregate(name)
+
+
+def test_rollup_sums_the_members_of_every_region():
+    index = RegionIndex(4)
+    index.add("A", [0, 1])
+    index.add("B", [1, 2, 2])
+    index.add("A", [1])
+
+    values = np.arange(12, dtype=np.float64).reshape(4, 3)
+    result = index.rollup(values)
+
+    assert index.regions == ["A", "B"]
+    np.testing.assert_array_equal(index.members("B"), [1, 2])
+    np.testing.assert_array_equal(result, [values[0] + values[1], values[1] + values[2]])
+
+
+def test_world_matches_the_evaluation_of_all_events(disasters, population_index):
+    table = EventTable.from_disasters(disasters, population_index)
+    index = RegionIndex.from_event_table(table, population_index)
+    adpys, numbers, deaths = index.aggregate(table, population_index.counts)
+
+    expected_adpys, expected_numbers, expected_deaths = aggregate(table, population_index.counts)
+    world = index.regions.index("World")
+
+    assert "Western Africa" not in [population_index.population_countries[row] for row in index.members("World")]
+    np.testing.assert_allclose(adpys[world], expected_adpys, rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(numbers[world], expected_numbers)
+    np.testing.assert_array_equal(deaths[world], expected_deaths)
+    np.testing.assert_array_equal(numbers[index.regions.index("Africa")] + numbers[index.regions.index("Europe")],
+                                  expected_numbers)
+
+
+def test_membership_adds_regions_and_the_index_can_be_saved(tmp_path, disasters, population_index):
+    table = EventTable.from_disasters(disasters, population_index)
+    index = RegionIndex.from_event_table(table, population_index, {"Sahel": ["Niger", "Nigeria", "Atlantis"]})
+
+    path = str(tmp_path / "regions.npz")
+    index.save(path)
+    loaded = RegionIndex.load(path)
+
+    assert loaded.regions == index.regions
+    np.testing.assert_array_equal(loaded.members("Sahel"), [0, 1])
+    np.testing.assert_array_equal(loaded.rollup(population_index.counts), index.rollup(population_index.counts))
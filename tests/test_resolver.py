@@ -0,0 +1,99 @@
+import json
+import os
+import resolver
+from resolver import CountryResolver
+from store import publish_files, current_version
+
+
+POPULATION_COUNTRIES = [
+    "Africa", "Western Africa", "Melanesia", "Niger", "Nigeria", "Oman", "Romania", "Republic of Korea",
+    "Dem. People's Republic of Korea", "Micronesia", "Micronesia (Fed. States of)", "South Africa", "Sudan",
+    "South Sudan", "Germany"
+]
+
+
+def resolved(pairs):
+    country_resolver = CountryResolver(POPULATION_COUNTRIES)
+    country_resolver.build(pairs)
+
+    return country_resolver
+
+
+def test_exact_names_are_not_confused_with_similar_ones():
+    country_resolver = resolved([("Niger (the)", "NER"), ("Nigeria", "NGA"), ("Romania", "ROU"), ("Oman", "OMN"),
+                                 ("Sudan (the)", "SDN"), ("South Sudan", "SSD")])
+
+    assert country_resolver.resolve("Niger (the)") == "Niger"
+    assert country_resolver.resolve("Nigeria") == "Nigeria"
+    assert country_resolver.resolve("Romania") == "Romania"
+    assert country_resolver.resolve("Oman") == "Oman"
+    assert country_resolver.resolve("Sudan (the)") == "Sudan"
+    assert country_resolver.resolve("South Sudan") == "South Sudan"
+
+
+def test_corrections_resolve_both_koreas_and_micronesia():
+    country_resolver = resolved([
+        ("Korea (the Republic of)", "KOR"), ("Korea (the Democratic People's Republic of)", "PRK"),
+        ("Micronesia (Federated States of)", "FSM")
+    ])
+
+    assert country_resolver.resolve("Korea (the Republic of)") == "Republic of Korea"
+    assert country_resolver.resolve("Korea (the Democratic People's Republic of)") == "Dem. People's Republic of Korea"
+    assert country_resolver.resolve("Micronesia (Federated States of)") == "Micronesia (Fed. States of)"
+    assert country_resolver.table["Korea (the Republic of)"]["method"] == "correction"
+
+
+def test_iso_codes_resolve_other_spellings():
+    country_resolver = resolved([("Germany", "DEU"), ("Germany Fed Rep", "DEU")])
+
+    assert country_resolver.resolve("Germany Fed Rep") == "Germany"
+    assert country_resolver.table["Germany Fed Rep"]["method"] == "iso"
+
+
+def test_substring_matches_prefer_single_countries():
+    country_resolver = resolved([("South Africa Republic", "")])
+
+    assert country_resolver.resolve("South Africa Republic") == "South Africa"
+    assert country_resolver.aggregates() == []
+
+
+def test_matches_of_aggregates_are_flagged():
+    country_resolver = resolved([("Melanesia Islands", "")])
+
+    assert country_resolver.resolve("Melanesia Islands") == "Melanesia"
+    assert country_resolver.table["Melanesia Islands"]["aggregate"] is True
+    assert country_resolver.aggregates() == ["Melanesia Islands"]
+
+
+def test_unknown_countries_stay_unresolved():
+    country_resolver = resolved([("Atlantis", "ATL")])
+
+    assert country_resolver.resolve("Atlantis") is None
+    assert country_resolver.unresolved() == ["Atlantis"]
+
+
+def test_saved_tables_are_only_used_for_the_same_rules(tmp_path, monkeypatch):
+    path = str(tmp_path / "country_resolution.json")
+    resolved([("Nigeria", "NGA")]).save(path)
+
+    assert CountryResolver(POPULATION_COUNTRIES).load(path)
+    assert not CountryResolver(POPULATION_COUNTRIES[:-1]).load(path)
+
+    monkeypatch.setitem(resolver.COUNTRY_CORRECTIONS, "Nigeria", "Niger")
+    assert not CountryResolver(POPULATION_COUNTRIES).load(path)
+
+
+def test_saving_keeps_the_table_of_older_published_versions(tmp_path):
+    folder = str(tmp_path / "disasters")
+    publish_files(folder, {"all_disasters.json": lambda path: open(path, 'w').close()})
+    path = os.path.join(folder, "country_resolution.json")
+    resolved([("Nigeria", "NGA")]).save(path)
+    pinned = current_version(folder)
+
+    publish_files(folder, {"all_disasters.json": lambda path: open(path, 'w').close()})
+    resolved([("Niger (the)", "NER")]).save(path)
+
+    with open(os.path.join(pinned, "country_resolution.json"), 'r') as file:
+        assert list(json.load(file)["countries"]) == ["Nigeria"]
+    with open(path, 'r') as file:
+        assert list(json.load(file)["countries"]) == ["Niger (the)"]
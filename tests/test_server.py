@@ -0,0 +1,38 @@
+import threading
+import server
+from server import QueryService, error_message
+
+
+def test_error_messages_are_not_mangled():
+    assert error_message(KeyError("Unknown disaster type Flod")) == "Unknown disaster type Flod"
+    assert error_message(KeyError("'quoted' type")) == "'quoted' type"
+    assert error_message(ValueError("invalid literal for int() with base 10: 'x'")) == \
+        "invalid literal for int() with base 10: 'x'"
+
+
+def test_failed_reloads_keep_the_snapshot_and_the_watcher_running(monkeypatch):
+    service = QueryService(interval=0.001)
+    service.snapshot = snapshot = type("Snapshot", (), {"signature": "old"})()
+    monkeypatch.setattr(server, "file_signature", lambda: "new")
+
+    def fail():
+        raise RuntimeError("corrupt store")
+
+    monkeypatch.setattr(service, "load", fail)
+    assert not service.reload_if_changed() and not service.reload_if_changed()
+    assert service.snapshot is snapshot
+
+    checks = []
+
+    def check():
+        checks.append(1)
+        if len(checks) == 3:
+            service.stopped.set()
+        raise RuntimeError("signature unreadable")
+
+    monkeypatch.setattr(service, "reload_if_changed", check)
+    watcher = threading.Thread(target=service.watch)
+    watcher.start()
+    watcher.join(5)
+
+    assert not watcher.is_alive() and len(checks) == 3
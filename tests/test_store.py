@@ -0,0 +1,85 @@
+import json
+import os
+import numpy as np
+import pytest
+import store
+from store import publish_files, write_json_files, write_population_matrix, current_version
+from utils import FIRST_YEAR, YEAR_COUNT
+from lookup import PopulationIndex
+
+
+def read(folder, name):
+    with open(os.path.join(folder, name), 'r') as file:
+        return json.load(file)
+
+
+def versions(folder):
+    return sorted(os.listdir(os.path.join(os.path.dirname(folder), f".{os.path.basename(folder)}.versions")))
+
+
+def test_published_folder_is_a_link_to_a_complete_version(tmp_path):
+    folder = str(tmp_path / "data")
+    write_json_files(folder, {"a.json": 1, "b.json": 2})
+
+    assert os.path.islink(folder)
+    assert read(folder, "a.json") == 1 and read(folder, "b.json") == 2
+
+
+def test_readers_keep_their_version_and_unchanged_files_are_taken_over(tmp_path):
+    folder = str(tmp_path / "data")
+    write_json_files(folder, {"a.json": 1, "b.json": 2})
+    pinned = current_version(folder)
+
+    write_json_files(folder, {"a.json": 10})
+
+    assert read(pinned, "a.json") == 1
+    assert read(folder, "a.json") == 10 and read(folder, "b.json") == 2
+    assert os.path.samefile(os.path.join(pinned, "b.json"), os.path.join(folder, "b.json"))
+
+
+def test_failed_publication_keeps_the_old_version(tmp_path):
+    folder = str(tmp_path / "data")
+    write_json_files(folder, {"a.json": 1})
+    before = versions(folder)
+
+    def fail(path):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        publish_files(folder, {"a.json": fail})
+
+    assert read(folder, "a.json") == 1
+    assert versions(folder) == before
+
+
+def test_plain_folders_are_migrated_and_old_versions_removed(tmp_path):
+    folder = str(tmp_path / "data")
+    os.mkdir(folder)
+    with open(os.path.join(folder, "old.json"), 'w') as file:
+        json.dump("old", file)
+
+    for value in range(4):
+        write_json_files(folder, {"a.json": value})
+
+    assert os.path.islink(folder)
+    assert read(folder, "old.json") == "old" and read(folder, "a.json") == 3
+    assert len(versions(folder)) == store.KEEP_VERSIONS
+
+
+def test_population_matrix_and_index_are_published_together(tmp_path):
+    folder = tmp_path / "population"
+    converted_data = {
+        country: {str(year): {"count": count, "density": 2.5} for year in range(FIRST_YEAR, FIRST_YEAR + YEAR_COUNT)}
+        for country, count in {"Niger": 100.0, "Nigeria": 200.0}.items()
+    }
+    paths = [str(folder / "counts.npy"), str(folder / "densities.npy"), str(folder / "index.json")]
+
+    write_population_matrix(*paths, converted_data)
+    index = PopulationIndex.from_matrix(paths[0], paths[2])
+
+    assert len({os.path.dirname(os.path.realpath(path)) for path in paths}) == 1
+    assert index.population_countries == ["Niger", "Nigeria"]
+    np.testing.assert_array_equal(index.counts[:, 0], [100.0, 200.0])
+
+    with pytest.raises(ValueError):
+        write_population_matrix(paths[0], str(tmp_path / "densities.npy"), paths[2], converted_data)